@@ -3,10 +3,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import Schema, fields, ValidationError
 from app.extensions import db
 from app.models import User, EmailJob, EmailDelivery, SMTPConfiguration
-from app.utils.roles import ROLE_CONFIGURATIONS, ResourceLimit, Permission
+from app.utils.roles import (
+    ROLE_CONFIGURATIONS, ROLE_DAILY_EMAIL_LIMITS, ResourceLimit, Permission
+)
 from app.utils.decorators import permission_required, require_verified_email
 from app.tasks.email_tasks import send_single_email_task
 from app.tasks.email_tasks import process_email_batch
+from app.services.mail_service import MailService
 from datetime import datetime, timezone
 from sqlalchemy import func
 from typing import List
@@ -48,8 +51,7 @@ def send_single_email():
     user = User.query.get_or_404(user_id)
 
     # Check daily limit
-    daily_limit = ROLE_CONFIGURATIONS[user.role]['limits'][
-        ResourceLimit.DAILY_EMAILS.value]
+    daily_limit = ROLE_DAILY_EMAIL_LIMITS[user.role]
 
     start_of_day = datetime.now(timezone.utc).replace(
         hour=0, minute=0, second=0, microsecond=0)
@@ -90,6 +92,7 @@ def send_single_email():
     )
     db.session.add(delivery)
     db.session.commit()
+    MailService.count_job_recipients(user_id, job.recipient_count)
 
     # Queue the email task
     task = send_single_email_task.delay(
@@ -134,8 +137,7 @@ def send_batch_email():
         }), 403
 
     # Check daily limit
-    daily_limit = ROLE_CONFIGURATIONS[user.role]['limits'][
-        ResourceLimit.DAILY_EMAILS.value]
+    daily_limit = ROLE_DAILY_EMAIL_LIMITS[user.role]
 
     start_of_day = datetime.now(timezone.utc).replace(
         hour=0, minute=0, second=0, microsecond=0)
@@ -181,6 +183,7 @@ def send_batch_email():
     ]
     db.session.bulk_save_objects(deliveries)
     db.session.commit()
+    MailService.count_job_recipients(user_id, job.recipient_count)
 
     # Queue the batch email task
     task = process_email_batch.delay(job_id=job.id)
@@ -280,6 +280,7 @@ def set_default_config(config_id: int):
         # Set new default
         config.is_default = True
         db.session.commit()
+        SMTPService.invalidate_default_config(config.user_id)
 
         return jsonify({
             "message": "Default SMTP configuration updated",
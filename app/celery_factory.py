@@ -15,7 +15,9 @@ def init_celery(app):
         timezone='UTC',
         enable_utc=True,
         CELERY_IMPORTS=[
-            "app.tasks.email_tasks"
+            "app.tasks.email_tasks",
+            "app.tasks.api_key_tasks",
+            "app.tasks.smtp_tasks"
         ]
     )
 
@@ -4,13 +4,14 @@ from .email import EmailJob, EmailDelivery
 from .audit import AuditLog
 from .api_key import ApiKey
 from .webhook import Webhook
-from .smtp import SMTPConfiguration
+from .smtp import SMTPConfiguration, UserSMTPHealth
 from .notification import Notification, UserPreferences
 from .campaign import EmailCampaign
 
 # Export all models for easy importing
 __all__ = ['User', 'Template', 'EmailJob', 'EmailDelivery', 'ApiKey',
            'AuditLog', 'Webhook', 'SMTPConfiguration', 'Notification',
-           'UserPreferences', 'TemplateStats', 'EmailCampaign', 'TemplateVersion']
+           'UserPreferences', 'TemplateStats', 'EmailCampaign', 'TemplateVersion',
+           'UserSMTPHealth']
 
 
@@ -5,9 +5,14 @@ from app.utils.db import JSONBType
 from app.models.base import BaseModel, AuditMixin
 from app.models.mixins import SerializationMixin
 from flask import current_app
+from sqlalchemy import case, func
 
 import secrets
 import enum
+import re
+
+# ms_<8 hex prefix>_<token_urlsafe random part>
+API_KEY_PATTERN = re.compile(r'ms_([0-9a-fA-F]{8})_([A-Za-z0-9_-]+)')
 
 
 class ApiKeyPermission(enum.Enum):
@@ -58,6 +63,12 @@ class ApiKey(BaseModel, AuditMixin, SerializationMixin):
     user = db.relationship('User', back_populates='api_keys')
     usage_logs = db.relationship('ApiKeyUsage', back_populates='api_key')
 
+    __table_args__ = (
+        # Prefix lookups in validate_key only consider active keys
+        db.Index('idx_api_keys_prefix_active', key_prefix,
+                 postgresql_where=is_active),
+    )
+
     @classmethod
     def generate_key(cls) -> tuple[str, str, str]:
         """Generate a new API key, prefix, and hash."""
@@ -69,27 +80,20 @@ class ApiKey(BaseModel, AuditMixin, SerializationMixin):
         key_hash = cls.hash_key(key)
         return key, prefix, key_hash
 
+    @staticmethod
+    def parse_prefix(key: str) -> Optional[str]:
+        """Return the prefix of a well-formed API key, or None.
+        Format: ms_<8_hex_chars>_<urlsafe_random>
+        """
+        match = API_KEY_PATTERN.fullmatch(key)
+        return match.group(1) if match else None
+
     @staticmethod
     def validate_key_format(key: str) -> bool:
         """Validate the format of an API key.
         Format: ms_<prefix>_<random>
-        Only validates the prefix format (ms_<8_hex_chars>_)
         """
-        if not key.startswith("ms_"):
-            return False
-
-        # Split should have at least 3 parts
-        parts = key.split('_', 2)
-        if len(parts) < 3:
-            return False
-
-        # Validate prefix is 8 hex characters
-        prefix = parts[1]
-        try:
-            int(prefix, 16)  # Validate hex format
-            return len(prefix) == 8
-        except ValueError:
-            return False
+        return ApiKey.parse_prefix(key) is not None
 
     @staticmethod
     def hash_key(key: str) -> str:
@@ -112,20 +116,30 @@ class ApiKey(BaseModel, AuditMixin, SerializationMixin):
         """Check if key has specific permission."""
         return permission.value in self.permissions
 
-    def track_usage(self, endpoint: str, status_code: int):
-        """Track API key usage."""
-        try:
-            # Update last used timestamp
-            self.last_used_at = datetime.now(timezone.utc)
+    def track_usage(self, endpoint: str, status_code: int,
+                    update_counters: bool = True):
+        """Track API key usage.
 
-            # Reset daily counter if needed
-            today = datetime.now(timezone.utc).date()
-            if self.last_reset_date != today:
-                self.daily_requests = 0
+        Args:
+            endpoint: Request path
+            status_code: Response status code
+            update_counters: Update last_used_at/daily_requests on the row;
+                False when they were buffered by ApiKeyService.buffer_usage
+        """
+        try:
+            if update_counters:
+                # Update last used timestamp
+                self.last_used_at = datetime.now(timezone.utc)
+
+                # Increment daily requests, resetting the counter on a new
+                # day. Done in SQL so the current values never need loading.
+                today = datetime.now(timezone.utc).date()
+                self.daily_requests = case(
+                    (ApiKey.last_reset_date == today,
+                     func.coalesce(ApiKey.daily_requests, 0) + 1),
+                    else_=1
+                )
                 self.last_reset_date = today
-
-            # Increment daily requests
-            self.daily_requests += 1
             # Create usage log
             usage = ApiKeyUsage(
                 api_key_id=self.id,
@@ -183,3 +197,8 @@ class ApiKeyUsage(BaseModel):
 
     # Relationships
     api_key = db.relationship('ApiKey', back_populates='usage_logs')
+
+    __table_args__ = (
+        db.Index('idx_api_key_usage_covering', api_key_id, timestamp,
+                 postgresql_include=['status_code', 'endpoint']),
+    )
@@ -18,6 +18,8 @@ def serialize_value(value):
         return value.isoformat()
     elif isinstance(value, enum.Enum):
         return value.value
+    elif isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
     return value
 
 
@@ -3,7 +3,7 @@ from app.extensions import db
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from app.utils.db import JSONBType
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_
 import uuid
 
 class EmailJob(BaseModel, AuditMixin):
@@ -45,6 +45,8 @@ class EmailJob(BaseModel, AuditMixin):
     bounce_count = db.Column(db.Integer, default=0)
     open_count = db.Column(db.Integer, default=0)
     click_count = db.Column(db.Integer, default=0)
+    # Deliveries clicked at least once, for engagement metrics
+    unique_click_count = db.Column(db.Integer, default=0)
 
     # Store additional job metadata
     meta_data = db.Column(JSONBType, default=dict)
@@ -71,6 +73,14 @@ class EmailJob(BaseModel, AuditMixin):
     __table_args__ = (
         db.Index('idx_job_status_priority', status,
                  priority),  # For efficient job queuing
+        # Covering indexes for analytics aggregations
+        db.Index('idx_email_jobs_user_created', 'user_id', 'created_at',
+                 postgresql_include=['recipient_count', 'success_count',
+                                     'failure_count']),
+        db.Index('idx_email_jobs_template', 'template_id',
+                 postgresql_include=['recipient_count', 'success_count']),
+        db.Index('idx_email_jobs_smtp', 'smtp_config_id',
+                 postgresql_include=['recipient_count', 'success_count']),
     )
 
     def __init__(self, **kwargs):
@@ -111,12 +121,16 @@ class EmailDelivery(BaseModel):
     __tablename__ = 'email_deliveries'
 
     STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'  # claimed by a worker
     STATUS_SENT = 'sent'
     STATUS_DELIVERED = 'delivered'
     STATUS_FAILED = 'failed'
     STATUS_BOUNCED = 'bounced'
     STATUS_COMPLAINED = 'complained'
 
+    # A claim older than this belongs to a worker that died mid-batch
+    CLAIM_LEASE = timedelta(minutes=15)
+
     job_id = db.Column(db.Integer, db.ForeignKey(
         'email_jobs.id', ondelete='CASCADE'),
         nullable=False, index=True)
@@ -153,8 +167,22 @@ class EmailDelivery(BaseModel):
     __table_args__ = (
         db.Index('idx_delivery_tracking', tracking_id),  # For tracking lookups
         db.Index('idx_delivery_status', job_id, status),  # For status queries
+        # Covering index for job open/click counts
+        db.Index('idx_delivery_job_engagement', job_id,
+                 postgresql_include=['opened_at', 'clicked_at']),
     )
 
+    @classmethod
+    def claimable(cls):
+        """Filter for deliveries a worker may claim: pending, or an expired claim."""
+        lease_expired = datetime.now(timezone.utc) - cls.CLAIM_LEASE
+        return or_(
+            cls.status == cls.STATUS_PENDING,
+            and_(cls.status == cls.STATUS_SENDING,
+                 or_(cls.last_attempt.is_(None),
+                     cls.last_attempt < lease_expired))
+        )
+
     def record_open(self, user_agent: str = None, ip_address: str = None):
         """Record an email open event."""
         from app.models.campaign import CampaignEvent
@@ -174,13 +202,14 @@ class EmailDelivery(BaseModel):
                 )
                 db.session.add(event)
 
-            # Update counters
-            self.job.open_count += 1
+            # Update counters atomically
+            self.job.open_count = func.coalesce(EmailJob.open_count, 0) + 1
             db.session.commit()
 
     def record_click(self, link_id: int, user_agent: str = None, ip_address: str = None):
         """Record a link click event."""
         from app.models.campaign import CampaignEvent
+        first_click = self.clicked_at is None
         self.clicked_at = datetime.now(timezone.utc)
 
         # Create event if part of a campaign
@@ -197,8 +226,11 @@ class EmailDelivery(BaseModel):
             )
             db.session.add(event)
 
-        # Update counters
-        self.job.click_count += 1
+        # Update counters atomically
+        self.job.click_count = func.coalesce(EmailJob.click_count, 0) + 1
+        if first_click:
+            self.job.unique_click_count = func.coalesce(
+                EmailJob.unique_click_count, 0) + 1
         db.session.commit()
 
     def to_dict(self):
@@ -1,6 +1,7 @@
 from app.extensions import db
 from app.models.base import BaseModel, AuditMixin
 from datetime import datetime, timezone
+from sqlalchemy import event, func, inspect
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 
 
@@ -12,7 +13,9 @@ class SMTPConfiguration(BaseModel, AuditMixin):
     # Friendly name for this configuration
     name = db.Column(db.String(255), nullable=False)
     is_default = db.Column(db.Boolean, default=False)
-    is_active = db.Column(db.Boolean, default=True)
+    # Old values are needed to keep UserSMTPHealth in sync
+    is_active = db.column_property(
+        db.Column(db.Boolean, default=True), active_history=True)
 
     # SMTP Details (encrypted)
     host = db.Column(db.String(255), nullable=False)
@@ -30,7 +33,8 @@ class SMTPConfiguration(BaseModel, AuditMixin):
 
     last_used_at = db.Column(TIMESTAMP(timezone=True))
     last_test_at = db.Column(TIMESTAMP(timezone=True))
-    failure_count = db.Column(db.Integer, default=0)
+    failure_count = db.column_property(
+        db.Column(db.Integer, default=0), active_history=True)
 
     __table_args__ = (
         db.Index('idx_smtp_user_default', user_id, is_default),
@@ -52,6 +56,32 @@ class SMTPConfiguration(BaseModel, AuditMixin):
             return True
         return self.emails_sent_today < self.daily_limit
 
+    @staticmethod
+    def record_failure(config_id: int) -> None:
+        """Increment a config's failure count in one UPDATE, without loading it.
+
+        Bypasses the ORM, so the health bucket move that
+        smtp_health_after_update would make is applied here. The caller
+        commits.
+        """
+        table = SMTPConfiguration.__table__
+        row = db.session.execute(
+            table.update()
+            .where(table.c.id == config_id)
+            .values(failure_count=func.coalesce(table.c.failure_count, 0) + 1)
+            .returning(table.c.user_id, table.c.is_active,
+                       table.c.failure_count)
+        ).first()
+        if row is None or row.is_active is False:
+            return
+
+        old_bucket = UserSMTPHealth.bucket_for(row.failure_count - 1)
+        new_bucket = UserSMTPHealth.bucket_for(row.failure_count)
+        if old_bucket != new_bucket:
+            connection = db.session.connection()
+            _apply_health_delta(connection, row.user_id, old_bucket, -1)
+            _apply_health_delta(connection, row.user_id, new_bucket, 1)
+
     def to_dict(self, include_sensitive: bool = False) -> dict:
         """Convert to dictionary, optionally excluding sensitive data."""
         data = {
@@ -77,3 +107,91 @@ class SMTPConfiguration(BaseModel, AuditMixin):
             data['password'] = self.password
 
         return data
+
+
+class UserSMTPHealth(db.Model):
+    """Denormalized per-user SMTP health counters for the dashboard."""
+    __tablename__ = 'user_smtp_health'
+
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'users.id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    healthy = db.Column(db.Integer, nullable=False, default=0)
+    warning = db.Column(db.Integer, nullable=False, default=0)
+    critical = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def bucket_for(failure_count) -> str:
+        """Map a failure count to its health bucket."""
+        failure_count = failure_count or 0
+        if failure_count == 0:
+            return 'healthy'
+        if failure_count <= 3:
+            return 'warning'
+        return 'critical'
+
+    def to_dict(self) -> dict:
+        return {
+            'total_active': self.total,
+            'healthy': self.healthy,
+            'warning': self.warning,
+            'critical': self.critical
+        }
+
+
+def _apply_health_delta(connection, user_id: int, bucket: str,
+                        delta: int) -> None:
+    """Shift one config in or out of a user's health bucket."""
+    table = UserSMTPHealth.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.user_id == user_id)
+        .values({
+            table.c.total: table.c.total + delta,
+            table.c[bucket]: table.c[bucket] + delta
+        })
+    )
+
+
+def _history_value(state, attr: str):
+    """Return the pre-flush value of an attribute."""
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+@event.listens_for(SMTPConfiguration, 'after_insert')
+def smtp_health_after_insert(mapper, connection, target):
+    """Count a newly created active configuration."""
+    if target.is_active is not False:
+        _apply_health_delta(connection, target.user_id,
+                            UserSMTPHealth.bucket_for(target.failure_count), 1)
+
+
+@event.listens_for(SMTPConfiguration, 'after_update')
+def smtp_health_after_update(mapper, connection, target):
+    """Move a configuration between buckets when its health changes."""
+    state = inspect(target)
+    old_active = _history_value(state, 'is_active') is not False
+    new_active = target.is_active is not False
+    old_bucket = UserSMTPHealth.bucket_for(
+        _history_value(state, 'failure_count'))
+    new_bucket = UserSMTPHealth.bucket_for(target.failure_count)
+
+    if old_active == new_active and (
+            not new_active or old_bucket == new_bucket):
+        return
+
+    if old_active:
+        _apply_health_delta(connection, target.user_id, old_bucket, -1)
+    if new_active:
+        _apply_health_delta(connection, target.user_id, new_bucket, 1)
+
+
+@event.listens_for(SMTPConfiguration, 'after_delete')
+def smtp_health_after_delete(mapper, connection, target):
+    """Drop a deleted configuration from the counters."""
+    if _history_value(inspect(target), 'is_active') is not False:
+        _apply_health_delta(connection, target.user_id,
+                            UserSMTPHealth.bucket_for(target.failure_count), -1)
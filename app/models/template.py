@@ -2,7 +2,6 @@ from .base import BaseModel, SoftDeleteMixin, AuditMixin
 from app.extensions import db
 from typing import Dict, Any, Optional, List, Set
 from app.models.mixins import SerializationMixin, AdminQueryMixin
-from sqlalchemy import event
 from app.utils.db import TSVectorType
 from datetime import datetime, timezone
 from app.utils.db import JSONBType
@@ -41,7 +40,12 @@ class Template(BaseModel, SoftDeleteMixin, AuditMixin, SerializationMixin, Admin
     html_content = db.Column(db.Text, nullable=False)
     version = db.Column(db.Integer, default=1)
     is_active = db.Column(db.Boolean, default=True, index=True)
-    search_vector = db.Column(TSVectorType)
+    # Maintained by Postgres on every row write
+    search_vector = db.Column(TSVectorType, db.Computed(
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(html_content, '')), 'C')",
+        persisted=True))
     category = db.Column(db.String(50), nullable=True, index=True)
     tags = db.Column(db.JSON, default=list)
     published_at = db.Column(db.DateTime(timezone=True), nullable=True)
@@ -55,6 +59,12 @@ class Template(BaseModel, SoftDeleteMixin, AuditMixin, SerializationMixin, Admin
         db.Index('idx_template_search', 'search_vector',
                  postgresql_using='gin'),
     )
+    # UPDATEs match on the version they loaded, so a concurrent edit fails
+    # with StaleDataError instead of being overwritten. Services bump it
+    __mapper_args__ = {
+        'version_id_col': version,
+        'version_id_generator': False,
+    }
 
     @property
     def required_variables(self) -> Set[str]:
@@ -121,14 +131,6 @@ class Template(BaseModel, SoftDeleteMixin, AuditMixin, SerializationMixin, Admin
         db.session.flush()
 
 
-@event.listens_for(Template, 'before_insert')
-@event.listens_for(Template, 'before_update')
-def update_search_vector(mapper, connection, target):
-    """Update search_vector before save."""
-    from app.services.search_service import TemplateSearchService
-    TemplateSearchService.update_search_vector(target)
-
-
 class TemplateStats(BaseModel):
     __tablename__ = 'template_stats'
 
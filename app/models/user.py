@@ -2,6 +2,8 @@ from .base import BaseModel, SoftDeleteMixin, AuditMixin
 from datetime import datetime, timezone
 from typing import List, Dict
 from app.extensions import db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from .smtp import SMTPConfiguration
 from .notification import UserPreferences, Notification
@@ -38,7 +40,8 @@ class User(BaseModel, SoftDeleteMixin, AuditMixin):
     reset_token = db.Column(db.String(128), unique=True, nullable=True)
     reset_token_expires = db.Column(TIMESTAMP(timezone=True), nullable=True)
 
-    refresh_token = db.Column(db.String(512), unique=True, nullable=True)
+    # Raw SHA-256 digest of the issued refresh token
+    refresh_token = db.Column(db.LargeBinary(32), unique=True, nullable=True)
     refresh_token_expires = db.Column(TIMESTAMP(timezone=True), nullable=True)
 
     # Email verification fields
@@ -124,3 +127,29 @@ class User(BaseModel, SoftDeleteMixin, AuditMixin):
     def quota_remaining(self) -> int:
         """Get remaining email quota for the month."""
         return max(0, self.monthly_quota - self.emails_sent_this_month)
+
+
+@event.listens_for(User, 'after_update')
+def user_role_after_update(mapper, connection, target):
+    """Remember users whose role changed until the change is committed."""
+    if inspect(target).attrs.role.history.has_changes():
+        object_session(target).info.setdefault(
+            'role_changed_users', set()).add(target.id)
+
+
+@event.listens_for(db.Session, 'after_commit')
+def invalidate_changed_roles(session):
+    """Drop cached roles once a role change is visible to other requests."""
+    user_ids = session.info.pop('role_changed_users', None)
+    if not user_ids:
+        return
+    # Import here to avoid circular imports
+    from app.services.quota_service import QuotaService
+    for user_id in user_ids:
+        QuotaService.invalidate_user_role(user_id)
+
+
+@event.listens_for(db.Session, 'after_rollback')
+def forget_changed_roles(session):
+    """A rolled back role change leaves the cached role valid."""
+    session.info.pop('role_changed_users', None)
@@ -2,7 +2,9 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta, timezone
 from sqlalchemy import func
 from app.extensions import db
-from app.models import EmailJob, EmailDelivery, Template, SMTPConfiguration
+from app.models import (
+    EmailJob, Template, SMTPConfiguration, UserSMTPHealth
+)
 from app.utils.logging import logger
 
 
@@ -32,6 +34,13 @@ class AnalyticsService:
             func.sum(EmailJob.failure_count)
         ).scalar() or 0
 
+        return AnalyticsService._build_email_metrics(
+            total_sent, successful, failed)
+
+    @staticmethod
+    def _build_email_metrics(total_sent: int, successful: int,
+                             failed: int) -> Dict[str, Any]:
+        """Build the email metrics dict from raw totals."""
         return {
             'total_sent': total_sent,
             'successful': successful,
@@ -40,6 +49,31 @@ class AnalyticsService:
             'failure_rate': (failed / total_sent * 100) if total_sent > 0 else 0
         }
 
+    @staticmethod
+    def get_two_period_metrics(user_id: int, d30: datetime, d60: datetime,
+                               now: datetime) -> Dict[str, Dict[str, Any]]:
+        """Get email metrics for the current and previous period in one scan."""
+        current = EmailJob.created_at.between(d30, now)
+        previous = EmailJob.created_at.between(d60, d30)
+
+        row = db.session.query(
+            func.sum(EmailJob.recipient_count).filter(current),
+            func.sum(EmailJob.success_count).filter(current),
+            func.sum(EmailJob.failure_count).filter(current),
+            func.sum(EmailJob.recipient_count).filter(previous),
+            func.sum(EmailJob.success_count).filter(previous),
+            func.sum(EmailJob.failure_count).filter(previous)
+        ).filter(
+            EmailJob.user_id == user_id,
+            EmailJob.created_at >= d60
+        ).one()
+
+        totals = [value or 0 for value in row]
+        return {
+            'current': AnalyticsService._build_email_metrics(*totals[:3]),
+            'previous': AnalyticsService._build_email_metrics(*totals[3:])
+        }
+
     @staticmethod
     def get_smtp_performance(user_id: int) -> List[Dict[str, Any]]:
         """Get performance metrics for each SMTP configuration."""
@@ -135,13 +169,14 @@ class AnalyticsService:
     @staticmethod
     def get_engagement_metrics(user_id: int) -> Dict[str, Any]:
         """Get email engagement metrics (opens, clicks, etc.)."""
-        deliveries = EmailDelivery.query.join(EmailJob).filter(
+        # Read the per-job counters instead of scanning deliveries
+        total_delivered, total_opened, total_clicked = db.session.query(
+            func.coalesce(func.sum(EmailJob.success_count), 0),
+            func.coalesce(func.sum(EmailJob.open_count), 0),
+            func.coalesce(func.sum(EmailJob.unique_click_count), 0)
+        ).filter(
             EmailJob.user_id == user_id
-        )
-
-        total_delivered = deliveries.filter(
-            EmailDelivery.status == 'sent'
-        ).count()
+        ).one()
 
         if total_delivered == 0:
             return {
@@ -151,13 +186,6 @@ class AnalyticsService:
                 'open_rate': 0,
                 'click_rate': 0
             }
-        total_opened = deliveries.filter(
-            EmailDelivery.opened_at.isnot(None)
-        ).count()
-
-        total_clicked = deliveries.filter(
-            EmailDelivery.clicked_at.isnot(None)
-        ).count()
 
         return {
             'total_delivered': total_delivered,
@@ -167,24 +195,51 @@ class AnalyticsService:
             'click_rate': (total_clicked / total_delivered) * 100
         }
 
-    @ staticmethod
+    @staticmethod
+    def get_smtp_health(user_id: int) -> Dict[str, int]:
+        """Get SMTP health counters, rebuilding them if not tracked yet."""
+        health = db.session.get(UserSMTPHealth, user_id)
+        if health:
+            return health.to_dict()
+
+        failure_count = func.coalesce(SMTPConfiguration.failure_count, 0)
+        total, healthy, warning, critical = db.session.query(
+            func.count(SMTPConfiguration.id),
+            func.count(SMTPConfiguration.id).filter(failure_count == 0),
+            func.count(SMTPConfiguration.id).filter(
+                failure_count.between(1, 3)),
+            func.count(SMTPConfiguration.id).filter(failure_count > 3)
+        ).filter(
+            SMTPConfiguration.user_id == user_id,
+            SMTPConfiguration.is_active.isnot(False)
+        ).one()
+        health = UserSMTPHealth(user_id=user_id, total=total, healthy=healthy,
+                                warning=warning, critical=critical)
+
+        try:
+            db.session.add(health)
+            db.session.commit()
+        except Exception as e:
+            # Another request seeded the row first; the counts still hold
+            db.session.rollback()
+            logger.warning(f"Could not store SMTP health counters: {str(e)}")
+
+        return health.to_dict()
+
+    @staticmethod
     def get_user_dashboard_metrics(user_id: int) -> Dict[str, Any]:
         """Get comprehensive dashboard metrics for a user."""
         try:
-            # Get last 30 days metrics
-            current_period = AnalyticsService.get_email_metrics(
-                user_id,
-                start_date=datetime.now(timezone.utc) - timedelta(days=30)
-            )
-
-            # Get previous 30 days for comparison
-            previous_start = datetime.now(timezone.utc) - timedelta(days=60)
-            previous_end = datetime.now(timezone.utc) - timedelta(days=30)
-            previous_period = AnalyticsService.get_email_metrics(
-                user_id,
-                start_date=previous_start,
-                end_date=previous_end
-            )
+            # Derive both periods from one timestamp so they line up
+            now = datetime.now(timezone.utc)
+            d30 = now - timedelta(days=30)
+            d60 = now - timedelta(days=60)
+
+            # Get last 30 days metrics and the previous 30 for comparison
+            periods = AnalyticsService.get_two_period_metrics(
+                user_id, d30, d60, now)
+            current_period = periods['current']
+            previous_period = periods['previous']
 
             # Calculate changes
             def calculate_change(current: float, previous: float) -> float:
@@ -193,31 +248,24 @@ class AnalyticsService:
                 return ((current - previous) / previous) * 100
 
             # Get SMTP health
-            smtp_configs = SMTPConfiguration.query.filter_by(
-                user_id=user_id,
-                is_active=True
-            ).all()
-            smtp_health = {
-                'total_active': len(smtp_configs),
-                'healthy': len([s for s in smtp_configs if s.failure_count == 0]),
-                'warning': len([s for s in smtp_configs if 0 < s.failure_count <= 3]),
-                'critical': len([s for s in smtp_configs if s.failure_count > 3])
-            }
+            smtp_health = AnalyticsService.get_smtp_health(user_id)
 
-            # Get template usage
-            template_usage = Template.query.filter_by(
-                user_id=user_id,
-                is_active=True
-            ).join(EmailJob).group_by(Template.id).with_entities(
+            # Get template usage, keeping templates that were never used
+            template_usage = db.session.query(
                 Template.id,
                 func.count(EmailJob.id).label('usage_count')
-            ).all()
+            ).outerjoin(
+                EmailJob, EmailJob.template_id == Template.id
+            ).filter(
+                Template.user_id == user_id,
+                Template.is_active == True  # noqa
+            ).group_by(Template.id).all()
 
             return {
                 'current_period': {
                     **current_period,
-                    'start_date': (datetime.now(timezone.utc) - timedelta(days=30)).isoformat(),
-                    'end_date': datetime.now(timezone.utc).isoformat()
+                    'start_date': d30.isoformat(),
+                    'end_date': now.isoformat()
                 },
                 'changes': {
                     'sent': calculate_change(current_period['total_sent'], previous_period['total_sent']),
@@ -225,8 +273,9 @@ class AnalyticsService:
                 },
                 'smtp_health': smtp_health,
                 'template_stats': {
-                    'total_templates': Template.query.filter_by(user_id=user_id, is_active=True).count(),
-                    'templates_used': len(template_usage),
+                    'total_templates': len(template_usage),
+                    'templates_used': sum(
+                        1 for t in template_usage if t.usage_count > 0),
                     'most_used': max([t.usage_count for t in template_usage], default=0)
                 },
                 'engagement': AnalyticsService.get_engagement_metrics(user_id)
@@ -1,15 +1,133 @@
 from typing import Optional, List, Tuple, Dict, Any
-from datetime import datetime, timezone, timedelta
-from app.extensions import db
+from datetime import date, datetime, timezone, timedelta
+from sqlalchemy import bindparam, case, func, or_, update
+from sqlalchemy.orm import make_transient_to_detached
+from redis.exceptions import WatchError
+from app.extensions import db, redis_client
 from app.models.api_key import ApiKey, ApiKeyType, ApiKeyPermission, ApiKeyUsage
 from app.utils.logging import logger
 from app.models.user import User
+from app.models.notification import Notification
 from app.utils.roles import ROLE_CONFIGURATIONS, ResourceLimit
+import json
 
 
 class ApiKeyService:
     """Service for managing API keys."""
 
+    CACHE_TTL = 300  # 5 minutes
+    MISSING_CACHE_TTL = 30  # Short-lived negative cache for unknown prefixes
+    MISSING_MARKER = 'missing'
+
+    # Per-request usage counters buffered in Redis until flush_buffered_usage
+    USAGE_LAST_USED_KEY = 'apikey:usage:last_used'  # key id -> unix time
+    USAGE_DAILY_KEY = 'apikey:usage:daily'  # "<key id>:<date>" -> requests
+
+    @staticmethod
+    def _get_cache_key(prefix: str) -> str:
+        """Generate cache key for an API key prefix."""
+        return f"apikey:{prefix}"
+
+    @staticmethod
+    def _get_version_key(prefix: str) -> str:
+        """Generate key for the invalidation counter of an API key prefix."""
+        return f"apikey:version:{prefix}"
+
+    @staticmethod
+    def _cache_key_lookup(prefix: str, api_key: Optional[ApiKey],
+                          version) -> None:
+        """
+        Cache the result of a prefix lookup.
+
+        The entry is only written if the prefix has not been invalidated
+        since version was read, so a lookup that raced a revoke cannot put
+        the revoked key back in the cache.
+        """
+        cache_key = ApiKeyService._get_cache_key(prefix)
+        version_key = ApiKeyService._get_version_key(prefix)
+        if not api_key:
+            ttl, value = ApiKeyService.MISSING_CACHE_TTL, ApiKeyService.MISSING_MARKER
+        else:
+            ttl, value = ApiKeyService.CACHE_TTL, json.dumps({
+                'id': api_key.id,
+                'user_id': api_key.user_id,
+                'name': api_key.name,
+                'key_hash': api_key.key_hash,
+                'key_type': api_key.key_type.value,
+                'permissions': api_key.permissions,
+                'expires_at': api_key.expires_at.isoformat()
+                if api_key.expires_at else None
+            })
+
+        try:
+            with redis_client.pipeline() as pipe:
+                pipe.watch(version_key)
+                if pipe.get(version_key) != version:
+                    return
+                pipe.multi()
+                pipe.setex(cache_key, ttl, value)
+                pipe.execute()
+        except WatchError:
+            # Invalidated while writing; the next lookup reads the row again
+            pass
+        except Exception as e:
+            logger.error(f"Error caching API key: {str(e)}")
+
+    @staticmethod
+    def _get_cached_key(prefix: str) -> Tuple[bool, Optional[ApiKey], Any]:
+        """
+        Look up an API key prefix in the cache.
+
+        Returns:
+            Tuple of (cache hit, detached ApiKey or None for a known miss,
+            invalidation version to pass to _cache_key_lookup on a miss)
+        """
+        version = None
+        try:
+            cached, version = redis_client.mget([
+                ApiKeyService._get_cache_key(prefix),
+                ApiKeyService._get_version_key(prefix)
+            ])
+            if not cached:
+                return False, None, version
+            if isinstance(cached, bytes):
+                cached = cached.decode('utf-8')
+            if cached == ApiKeyService.MISSING_MARKER:
+                return True, None, version
+
+            data = json.loads(cached)
+            api_key = ApiKey(
+                id=data['id'],
+                user_id=data['user_id'],
+                name=data['name'],
+                key_prefix=prefix,
+                key_hash=data['key_hash'],
+                key_type=ApiKeyType(data['key_type']),
+                permissions=data['permissions'],
+                expires_at=datetime.fromisoformat(data['expires_at'])
+                if data['expires_at'] else None,
+                is_active=True
+            )
+            # Mark as an existing row so it can be merged without a SELECT
+            make_transient_to_detached(api_key)
+            return True, api_key, version
+        except Exception as e:
+            logger.error(f"Error reading cached API key: {str(e)}")
+            return False, None, version
+
+    @staticmethod
+    def invalidate_cached_key(prefix: str) -> None:
+        """Drop a cached API key lookup and fence off lookups in flight."""
+        try:
+            version_key = ApiKeyService._get_version_key(prefix)
+            pipe = redis_client.pipeline()
+            pipe.incr(version_key)
+            pipe.expire(version_key, ApiKeyService.CACHE_TTL)
+            pipe.delete(ApiKeyService._get_cache_key(prefix))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error invalidating cached API key: {str(e)}")
+
     @staticmethod
     def create_key(
         user_id: int,
@@ -53,19 +171,24 @@ class ApiKeyService:
             )
 
             db.session.add(api_key)
+            # Flush to get the key id for the notification
+            db.session.flush()
 
-            # Add notification
-            user = User.query.get_or_404(user_id)
-            user.add_notification(
+            # Add notification in the same transaction as the key
+            db.session.add(Notification(
+                user_id=user_id,
                 title="API Key Created",
                 message=f"API key '{api_key.name}' has been created",
                 type="info",
                 category="api_key",
                 meta_data={"api_key_id": api_key.id}
-            )
+            ))
 
             db.session.commit()
 
+            # Clear any negative cache entry for this prefix
+            ApiKeyService.invalidate_cached_key(prefix)
+
             return api_key, key, None
 
         except Exception as e:
@@ -85,18 +208,19 @@ class ApiKeyService:
             Tuple of (ApiKey object if valid, error message if invalid)
         """
         try:
-            # First validate the key format
-            if not ApiKey.validate_key_format(key):
+            # Validate the format and extract prefix from ms_<prefix>_<random>
+            prefix = ApiKey.parse_prefix(key)
+            if not prefix:
                 return None, "Invalid API key format"
 
-            # Extract prefix from ms_<prefix>_<random>
-            prefix = key.split('_', 2)[1]
-
-            # Find key by prefix
-            api_key = ApiKey.query.filter_by(
-                key_prefix=prefix,
-                is_active=True
-            ).first()
+            # Find key by prefix, from cache when possible
+            cache_hit, api_key, version = ApiKeyService._get_cached_key(prefix)
+            if not cache_hit:
+                api_key = ApiKey.query.filter_by(
+                    key_prefix=prefix,
+                    is_active=True
+                ).first()
+                ApiKeyService._cache_key_lookup(prefix, api_key, version)
 
             if not api_key:
                 return None, "API key not found"
@@ -148,6 +272,7 @@ class ApiKeyService:
                 return False, "API key not found"
 
             api_key.revoke()
+            ApiKeyService.invalidate_cached_key(api_key.key_prefix)
 
             # Add notification
             user = User.query.get_or_404(user_id)
@@ -183,12 +308,12 @@ class ApiKeyService:
             Tuple of (usage stats dict, error message if any)
         """
         try:
-            # Get API key with a fresh query to ensure we have latest data
-            api_key = db.session.query(ApiKey).filter(
-                ApiKey.id == key_id,
-                ApiKey.user_id == user_id,
-                ApiKey.is_active == True
-            ).with_for_update().first()
+            # Plain read; the counters returned here are informational
+            api_key = ApiKey.query.filter_by(
+                id=key_id,
+                user_id=user_id,
+                is_active=True
+            ).first()
 
             if not api_key:
                 return None, "API key not found"
@@ -208,34 +333,31 @@ class ApiKeyService:
             end_date = datetime.now(timezone.utc)
             start_date = end_date - timedelta(days=days)
 
-            # Get usage logs with explicit join
-            usage_logs = db.session.query(ApiKeyUsage).filter(
+            # Per-endpoint counts in a single pass over the window
+            rows = db.session.query(
+                ApiKeyUsage.endpoint,
+                func.count(ApiKeyUsage.id),
+                func.count(ApiKeyUsage.id).filter(
+                    ApiKeyUsage.status_code.between(200, 299)),
+                func.count(ApiKeyUsage.id).filter(
+                    ApiKeyUsage.status_code >= 400)
+            ).filter(
                 ApiKeyUsage.api_key_id == key_id,
                 ApiKeyUsage.timestamp >= start_date,
                 ApiKeyUsage.timestamp <= end_date,
-            ).order_by(ApiKeyUsage.timestamp.desc()).all()
+            ).group_by(ApiKeyUsage.endpoint).all()
 
             # Calculate statistics
-            total_requests = len(usage_logs)
-            success_requests = sum(
-                1 for log in usage_logs if 200 <= log.status_code < 300)
-            error_requests = sum(
-                1 for log in usage_logs if log.status_code >= 400)
-
-            # Group by endpoint
-            endpoint_usage = {}
-            for log in usage_logs:
-                endpoint_usage[log.endpoint] = endpoint_usage.get(
-                    log.endpoint, 0) + 1
+            endpoint_usage = {endpoint: count for endpoint, count, _, _ in rows}
+            total_requests = sum(row[1] for row in rows)
+            success_requests = sum(row[2] for row in rows)
+            error_requests = sum(row[3] for row in rows)
 
             # Calculate daily average and success rate
             daily_average = round(total_requests / days, 2) if days > 0 else 0
             success_rate = round(
                 (success_requests / total_requests * 100), 2) if total_requests > 0 else 0
 
-            # Refresh the API key to get latest daily_requests
-            db.session.refresh(api_key)
-
             return {
                 "total_requests": total_requests,
                 "success_requests": success_requests,
@@ -262,16 +384,130 @@ class ApiKeyService:
     def cleanup_expired_keys():
         """Clean up expired API keys."""
         try:
-            expired_keys = ApiKey.query.filter(
-                ApiKey.expires_at < datetime.now(timezone.utc),
-                ApiKey.is_active == True  # noqa
-            ).all()
+            now = datetime.now(timezone.utc)
+            # Revoke all expired keys in a single UPDATE
+            revoked_prefixes = db.session.execute(
+                update(ApiKey).where(
+                    ApiKey.expires_at < now,
+                    ApiKey.is_active == True  # noqa
+                ).values(
+                    is_active=False,
+                    expires_at=now
+                ).returning(ApiKey.key_prefix).execution_options(
+                    synchronize_session=False)
+            ).scalars().all()
+            db.session.commit()
 
-            for key in expired_keys:
-                key.revoke()
+            for prefix in revoked_prefixes:
+                ApiKeyService.invalidate_cached_key(prefix)
 
-            return len(expired_keys)
+            return len(revoked_prefixes)
 
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error cleaning up expired keys: {str(e)}")
             return 0
+
+    @staticmethod
+    def buffer_usage(api_key_id: int) -> bool:
+        """
+        Record a request against an API key in Redis instead of the key row.
+
+        Returns:
+            True if buffered, False if the caller should update the row itself
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(ApiKeyService.USAGE_LAST_USED_KEY,
+                      api_key_id, now.timestamp())
+            pipe.hincrby(ApiKeyService.USAGE_DAILY_KEY,
+                         f"{api_key_id}:{now.date().isoformat()}", 1)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error buffering API key usage: {str(e)}")
+            return False
+
+    @staticmethod
+    def flush_buffered_usage() -> Tuple[int, Optional[str]]:
+        """Write buffered last-used times and daily counts to api_keys."""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hgetall(ApiKeyService.USAGE_LAST_USED_KEY)
+            pipe.hgetall(ApiKeyService.USAGE_DAILY_KEY)
+            pipe.delete(ApiKeyService.USAGE_LAST_USED_KEY,
+                        ApiKeyService.USAGE_DAILY_KEY)
+            last_used, daily, _ = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading buffered API key usage: {str(e)}")
+            return 0, str(e)
+
+        def _str(value):
+            return value.decode('utf-8') if isinstance(value, bytes) else value
+
+        last_used_rows = [
+            {'b_id': int(key_id),
+             'b_used': datetime.fromtimestamp(float(ts), timezone.utc)}
+            for key_id, ts in last_used.items()
+        ]
+        daily_rows = []
+        for field, count in daily.items():
+            key_id, day = _str(field).split(':')
+            daily_rows.append({'id': int(key_id),
+                               'day': date.fromisoformat(day),
+                               'count': int(count)})
+        # Oldest day first so a flush spanning midnight resets correctly
+        daily_rows.sort(key=lambda row: row['day'])
+
+        table = ApiKey.__table__
+        try:
+            if last_used_rows:
+                db.session.execute(
+                    update(table).where(
+                        table.c.id == bindparam('b_id')
+                    ).values(
+                        last_used_at=func.greatest(
+                            func.coalesce(table.c.last_used_at,
+                                          bindparam('b_used')),
+                            bindparam('b_used'))
+                    ),
+                    last_used_rows
+                )
+            for row in daily_rows:
+                db.session.execute(
+                    update(table).where(
+                        table.c.id == row['id'],
+                        or_(table.c.last_reset_date.is_(None),
+                            table.c.last_reset_date <= row['day'])
+                    ).values(
+                        daily_requests=case(
+                            (table.c.last_reset_date == row['day'],
+                             func.coalesce(table.c.daily_requests, 0)
+                             + row['count']),
+                            else_=row['count']
+                        ),
+                        last_reset_date=row['day']
+                    )
+                )
+            db.session.commit()
+            return len(last_used_rows), None
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error flushing API key usage: {str(e)}")
+            # Put the counts back so the next flush can retry them
+            try:
+                pipe = redis_client.pipeline()
+                for row in last_used_rows:
+                    pipe.hset(ApiKeyService.USAGE_LAST_USED_KEY, row['b_id'],
+                              row['b_used'].timestamp())
+                for row in daily_rows:
+                    pipe.hincrby(ApiKeyService.USAGE_DAILY_KEY,
+                                 f"{row['id']}:{row['day'].isoformat()}",
+                                 row['count'])
+                pipe.execute()
+            except Exception as redis_error:
+                logger.error(
+                    f"Error restoring API key usage: {str(redis_error)}")
+            return 0, str(e)
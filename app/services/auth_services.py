@@ -1,10 +1,15 @@
 from datetime import datetime, timedelta, timezone
-from flask import request
+from flask import request, g, has_app_context
 from typing import Optional, Tuple
 import secrets
 import hashlib
+import base64
+import threading
+import time
+from collections import OrderedDict
 from flask_jwt_extended import create_access_token, create_refresh_token
-from app.models import User
+from sqlalchemy import bindparam, select
+from app.models import User, Notification
 from app.extensions import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask import current_app, render_template
@@ -12,6 +17,88 @@ from app.services.mail_service import MailService
 from app.services.verification_service import VerificationService
 
 
+def _hash_token(token: str) -> bytes:
+    """Hash a token for storage; hashlib's sha256 is OpenSSL-backed."""
+    return hashlib.sha256(token.encode()).digest()
+
+
+# Column-only lookups for the hot auth paths; a full User is only loaded
+# once the credential has been checked
+_LOGIN_LOOKUP = select(
+    User.id, User.password_hash, User.email_verified
+).where(
+    User.email == bindparam('email'),
+    User.is_active == True  # noqa
+)
+_REFRESH_TOKEN_LOOKUP = select(
+    User.id, User.refresh_token_expires
+).where(
+    User.refresh_token == bindparam('token'),
+    User.is_active == True  # noqa
+)
+
+
+def _utc_now() -> datetime:
+    """Current UTC time, read once per app context (i.e. per request)."""
+    if not has_app_context():
+        return datetime.now(timezone.utc)
+    if '_utc_now' not in g:
+        g._utc_now = datetime.now(timezone.utc)
+    return g._utc_now
+
+
+def _decode_token(token: str) -> Optional[bytes]:
+    """Decode an unpadded urlsafe base64 token back to its raw bytes."""
+    try:
+        return base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except ValueError:
+        return None
+
+
+# Recently failed (email, hash, password) logins, so repeated bad logins skip
+# the KDF. Only failures are cached and the key is per-process, so nothing here
+# can be used to verify a password outside this worker. The email is part of
+# the key because unknown emails share one dummy hash: without it, one miss
+# would make every other unknown email with that password a fast hit.
+_FAILED_CHECK_TTL = 60
+_FAILED_CHECK_MAX = 4096
+_failed_checks: "OrderedDict[bytes, float]" = OrderedDict()
+_failed_checks_lock = threading.Lock()
+_failed_checks_key = secrets.token_bytes(32)
+
+
+# Stand-in hash checked when the email is unknown; never matches a password
+_DUMMY_PASSWORD_HASH = generate_password_hash(secrets.token_urlsafe(16))
+
+
+def _check_password(email: str, password_hash: str, password: str) -> bool:
+    """check_password_hash with a short-lived cache of failed attempts."""
+    cache_key = hashlib.blake2b(
+        b'\0'.join((email.encode(), password_hash.encode(),
+                    password.encode())),
+        key=_failed_checks_key,
+        digest_size=16
+    ).digest()
+    now = time.monotonic()
+
+    with _failed_checks_lock:
+        expires = _failed_checks.get(cache_key)
+        if expires is not None:
+            if expires > now:
+                return False
+            del _failed_checks[cache_key]
+
+    if check_password_hash(password_hash, password):
+        return True
+
+    with _failed_checks_lock:
+        _failed_checks[cache_key] = now + _FAILED_CHECK_TTL
+        _failed_checks.move_to_end(cache_key)
+        while len(_failed_checks) > _FAILED_CHECK_MAX:
+            _failed_checks.popitem(last=False)
+    return False
+
+
 class AuthenticationService:
     @staticmethod
     def register_user(email: str, password: str, name: str,
@@ -74,12 +161,9 @@ class AuthenticationService:
 
         # Store refresh token in database
         user = db.session.get(User, user_id)
-        hashed_refresh_token = hashlib.sha256(
-            refresh_token.encode()
-        ).hexdigest()
+        hashed_refresh_token = _hash_token(refresh_token)
         user.refresh_token = hashed_refresh_token
-        user.refresh_token_expires = datetime.now(
-            timezone.utc) + timedelta(days=30)
+        user.refresh_token_expires = _utc_now() + timedelta(days=30)
         db.session.commit()
 
         return {
@@ -91,64 +175,65 @@ class AuthenticationService:
     @staticmethod
     def refresh_access_token(refresh_token: str) -> dict:
         """Generate new access token using refresh token."""
-        hashed_refresh_token = hashlib.sha256(
-            refresh_token.encode()
-        ).hexdigest()
+        hashed_refresh_token = _hash_token(refresh_token)
 
-        user = User.query.filter_by(
-            refresh_token=hashed_refresh_token,
-            is_active=True
+        row = db.session.execute(
+            _REFRESH_TOKEN_LOOKUP, {'token': hashed_refresh_token}
         ).first()
 
-        if not user or not user.refresh_token_expires:
+        if not row or not row.refresh_token_expires:
             raise ValueError('Invalid refresh token')
 
-        if user.refresh_token_expires < datetime.now(timezone.utc):
+        if row.refresh_token_expires < _utc_now():
+            user = db.session.get(User, row.id)
             user.refresh_token = None
             user.refresh_token_expires = None
             db.session.commit()
             raise ValueError('Refresh token expired')
 
-        tokens = AuthenticationService.generate_tokens(user.id)
+        tokens = AuthenticationService.generate_tokens(row.id)
 
         return tokens
 
     @staticmethod
     def authenticate_user(email: str, password: str) -> Tuple[User, str]:
         """Authenticate user and return user object with access token."""
-        user = User.query.filter_by(email=email, is_active=True).first()
+        row = db.session.execute(_LOGIN_LOOKUP, {'email': email}).first()
 
-        if not user:
+        # Unknown emails still pay for a hash check so response times
+        # don't reveal which accounts exist
+        password_hash = row.password_hash if row else _DUMMY_PASSWORD_HASH
+        if not _check_password(email, password_hash, password) or not row:
             raise ValueError('Invalid email or password')
 
-        if not user.email_verified:
+        if not row.email_verified:
             raise ValueError('Email not verified. Please verify your email before logging in.')
 
-        if not check_password_hash(user.password_hash, password):
-            raise ValueError('Invalid email or password')
+        user = db.session.get(User, row.id)
 
-        # create access token
-        tokens = AuthenticationService.generate_tokens(user.id)
-
-        # Add notification
-        user.add_notification(
+        # Add notification; committed together with the refresh token
+        db.session.add(Notification(
+            user_id=user.id,
             title="Activity: Login",
             message=f"Your account was accessed from {request.remote_addr}. If this was not you, please reset your password.",
             type="security",
             category="user",
             meta_data={"user_id": user.id}
-        )
+        ))
+
+        # create access token
+        tokens = AuthenticationService.generate_tokens(user.id)
 
         return user, tokens
 
     @staticmethod
     def generate_password_reset_token(user: User) -> str:
         """Generate a password reset token and save it to the user."""
-        token = secrets.token_urlsafe(32)
-        user.reset_token = token
-        user.reset_token_expires = datetime.now(
-            timezone.utc
-        ) + timedelta(hours=24)
+        # Only a digest of the raw token bytes is stored
+        raw_token = secrets.token_bytes(32)
+        token = base64.urlsafe_b64encode(raw_token).rstrip(b'=').decode('ascii')
+        user.reset_token = hashlib.sha256(raw_token).hexdigest()
+        user.reset_token_expires = _utc_now() + timedelta(hours=24)
         db.session.commit()
 
         return token
@@ -156,15 +241,19 @@ class AuthenticationService:
     @staticmethod
     def verify_reset_token(token: str) -> Optional[User]:
         """Verify a password reset token and return the user if valid."""
+        raw_token = _decode_token(token)
+        if not raw_token:
+            return None
+
         user = User.query.filter_by(
-            reset_token=token,
+            reset_token=hashlib.sha256(raw_token).hexdigest(),
             is_active=True,
         ).first()
 
         if not user or not user.reset_token_expires:
             return None
 
-        if user.reset_token_expires < datetime.now(timezone.utc):
+        if user.reset_token_expires < _utc_now():
             user.reset_token = None
             user.reset_token_expires = None
             db.session.commit()
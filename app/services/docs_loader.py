@@ -1,24 +1,99 @@
+import heapq
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import yaml
 import markdown
 from flask import current_app
 from app.extensions import redis_client
 from app.utils.logging import logger
-import json
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name, TextLexer
+import pickle
+
+
+# Use libyaml's parser for frontmatter when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Compiled once at import; load_docs runs these over every file
+# Heading and table patterns are matched against single lines
+_RE_HEADING_ID = re.compile(r'^(#+)\s*(.*?)\s*\{#([^}]+)\}')
+_RE_HEADING_SPACE = re.compile(r'^(#+)\s*(.*?)\s*$')
+_RE_TABLE_ROW = re.compile(r'.*\|.+\|')
+# Code blocks, tables and plain-text headings, rewritten in a single pass
+_RE_HTML_STYLE = re.compile(
+    r'<pre><code class="(?P<lang>[^"]+)">'
+    r'|(?P<table></?table>)'
+    r'|(?i:<h(?P<level>[1-6])>(?P<heading>[^<]+)</h(?P=level)>)'
+)
+_RE_STRIP_TAGS = re.compile(r'<[^>]+>')
+_RE_SLUG_INVALID = re.compile(r'[^\w\s-]')
+_RE_SLUG_SEPARATORS = re.compile(r'[-\s]+')
+_RE_ID_INVALID = re.compile(r'[^a-z0-9-]')
+_RE_TITLE = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+_RE_WORD = re.compile(r'\w+')
+
+# Docs are only written to Redis by this loader; v2 keys hold pickled dicts
+_CACHE_PREFIX = 'docs:v2'
+_PICKLE_PROTOCOL = 5
+
+# slug -> ((st_mtime_ns, st_size), doc) for docs already rendered in this process
+_rendered_docs: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+
+
+def _walk_markdown(root: str):
+    """Yield a DirEntry for every .md file under root, without re-statting."""
+    stack = [root]
+    while stack:
+        subdirs = []
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.endswith('.md') and entry.is_file():
+                        yield entry
+        except OSError as e:
+            logger.error(f"Error scanning docs directory: {str(e)}")
+        # Visit subdirectories in listing order, like Path.rglob
+        stack.extend(reversed(subdirs))
 
 
 class DocsLoader:
     """Service for loading and managing GitHub-flavored markdown documentation."""
 
+    LOAD_WORKERS = min(8, os.cpu_count() or 4)
+    # Rendered docs are keyed by file mtime/size and never go stale, so they
+    # outlive restarts and the regular doc cache
+    RENDER_CACHE_TTL = 7 * 24 * 3600
+
     def __init__(self, docs_dir: str = 'docs'):
         self.docs_dir = docs_dir
         self.docs_cache = {}
-        self.md = markdown.Markdown(
+        self.search_cache = {}
+        # Word -> slugs index over search text, built for one docs dict
+        self.search_index = None
+        self.category_tree = {}
+        # Result of the last load_docs and the file versions it was built from
+        self.loaded_docs = None
+        self.loaded_signature = None
+        self._local = threading.local()
+
+    @property
+    def md(self) -> markdown.Markdown:
+        """Markdown converters are stateful, so each thread gets its own."""
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            md = self._local.md = self._create_markdown()
+        return md
+
+    def _create_markdown(self) -> markdown.Markdown:
+        """Create a markdown converter with the docs extensions."""
+        return markdown.Markdown(
             extensions=[
                 'meta',
                 'fenced_code',
@@ -53,156 +128,236 @@ class DocsLoader:
             }
         )
 
-        # Pre-generate formatter for code highlighting
-        self.formatter = HtmlFormatter(
-            cssclass='highlight',
-            noclasses=True
-        )
-
-    def _highlight_code(self, code: str, language: str) -> str:
-        """Highlight code with inline styles for reliable rendering."""
-        try:
-            lexer = get_lexer_by_name(language)
-        except ValueError:
-            lexer = TextLexer()
-
-        return highlight(code, lexer, self.formatter)
-
     def _process_content(self, content: str) -> str:
-        """Pre-process markdown content."""
+        """Pre-process markdown content in a single line-by-line pass."""
         # Fix Windows line endings
-        content = content.replace('\r\n', '\n')
+        lines = content.replace('\r\n', '\n').split('\n')
+        out = []
+        fence = None  # opening line of the code block being collected
+        code = []
+
+        for i, line in enumerate(lines):
+            is_fence = line.lstrip().startswith('```')
+            if fence is not None:
+                if not is_fence:
+                    code.append(line)
+                    continue
+                # Fix code blocks - fences at column 0 with blank lines
+                # around them, code trimmed
+                out.extend(('', fence, '\n'.join(code).strip(), '```', ''))
+                fence = None
+                continue
 
-        # Fix heading IDs - convert {#id} syntax to markdown-compatible format
-        content = re.sub(
-            r'^(#+)\s*(.*?)\s*\{#([^}]+)\}',
-            r'\1 \2 {: #\3}',
-            content,
-            flags=re.MULTILINE
-        )
+            if is_fence:
+                fence, code = line.lstrip(), []
+                continue
 
-        # Fix heading lines - ensure space after #
-        content = re.sub(
-            r'^(#+)\s*(.*?)\s*$',
-            r'\1 \2',
-            content,
-            flags=re.MULTILINE
-        )
+            if line.startswith('#'):
+                # Fix heading IDs - convert {#id} syntax to markdown-compatible
+                # format, and ensure a single space after the #s
+                line = _RE_HEADING_ID.sub(r'\1 \2 {: #\3}', line)
+                line = _RE_HEADING_SPACE.sub(r'\1 \2', line)
 
-        # Fix code blocks - ensure proper spacing and language tags
-        def fix_code_block(match):
-            lang = match.group(1) or ''
-            code = match.group(2).strip()
-            return f"\n```{lang}\n{code}\n```\n"
-
-        content = re.sub(
-            r'```(.*?)\n(.*?)```',
-            fix_code_block,
-            content,
-            flags=re.DOTALL
-        )
+            out.append(line)
 
-        # Ensure proper table formatting
-        content = re.sub(
-            r'(\|[^\n]+\|)\n(?!\|)',
-            r'\1\n\n',
-            content
-        )
+            # Ensure proper table formatting - blank line after the last row
+            if (_RE_TABLE_ROW.fullmatch(line) and i + 1 < len(lines)
+                    and not lines[i + 1].startswith('|')):
+                out.append('')
 
-        # Ensure code blocks have proper spacing
-        content = re.sub(
-            r'```(\w+)?',
-            r'\n```\1',
-            content
-        )
+        if fence is not None:
+            # Unterminated block; leave it as written
+            out.extend(('', fence, *code))
 
-        return content
+        return '\n'.join(out)
 
     def _slugify(self, text: str) -> str:
         """Convert text to URL-friendly slug."""
-        text = re.sub(r'[^\w\s-]', '', text.lower())
-        return re.sub(r'[-\s]+', '-', text).strip('-')
+        text = _RE_SLUG_INVALID.sub('', text.lower())
+        return _RE_SLUG_SEPARATORS.sub('-', text).strip('-')
 
     def _add_css_classes(self, html_content: str) -> str:
         """Add CSS classes and structure to HTML."""
         # Add wrapper div
         html_content = f'<div class="markdown-body">{html_content}</div>'
 
-        # fix code blocks
-        html_content = re.sub(
-            r'<pre><code class="([^"]+)">',
-            r'<pre class="highlight"><code class="language-\1">',
-            html_content
-        )
+        def style(match):
+            # fix code blocks
+            lang = match.group('lang')
+            if lang is not None:
+                return f'<pre class="highlight"><code class="language-{lang}">'
 
-        # Style tables
-        html_content = html_content.replace(
-            '<table>',
-            '<div class="table-wrapper"><table class="markdown-table">'
-        ).replace('</table>', '</table></div>')
-
-        # Style headings with proper IDs
-        for i in range(1, 7):
-            html_content = re.sub(
-                f'<h{i}>([^<]+)</h{i}>',
-                f'<h{
-                    i} id="\\1" class="heading">\\1<a href="#\\1" class="anchor-link">#</a></h{i}>',
-                html_content,
-                flags=re.IGNORECASE
-            )
+            # Style tables
+            if match.group('table') == '<table>':
+                return '<div class="table-wrapper"><table class="markdown-table">'
+            if match.group('table') == '</table>':
+                return '</table></div>'
+
+            # Style headings with proper IDs
+            level, text = match.group('level'), match.group('heading')
+            return (f'<h{level} id="{text}" class="heading">{text}'
+                    f'<a href="#{text}" class="anchor-link">#</a></h{level}>')
 
-        return html_content
+        return _RE_HTML_STYLE.sub(style, html_content)
 
     def _make_id(self, text: str) -> str:
         """Create URL-friendly ID from text."""
         # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
+        text = _RE_STRIP_TAGS.sub('', text)
         # Convert to lowercase and replace spaces/special chars
-        return re.sub(r'[^a-z0-9-]', '', text.lower().replace(' ', '-'))
+        return _RE_ID_INVALID.sub('', text.lower().replace(' ', '-'))
 
     def load_docs(self) -> Dict[str, Dict]:
         """Load all markdown documents from the docs directory."""
         docs = {}
         docs_path = Path(current_app.root_path).parent / self.docs_dir
 
-        for file_path in docs_path.rglob('*.md'):
+        entries = list(_walk_markdown(str(docs_path)))
+
+        # Nothing added, removed or modified since the last load
+        signature = tuple(
+            (entry.path, self._entry_version(entry)) for entry in entries)
+        if self.loaded_docs is not None and signature == self.loaded_signature:
+            return self.loaded_docs
+
+        app = current_app._get_current_object()
+
+        # Overlap file reads and renders across a small thread pool
+        with ThreadPoolExecutor(
+            max_workers=min(self.LOAD_WORKERS, len(entries) or 1)
+        ) as executor:
+            loaded = list(executor.map(
+                lambda entry: self._load_file(app, docs_path, entry),
+                entries
+            ))
+
+        # Queue every Redis write and send them in one round trip
+        pipe = redis_client.pipeline(transaction=False)
+
+        # Group docs into per-category heaps as they are collected, keyed
+        # by (order, title) with load position breaking ties
+        heaps = {}
+        category_orders = {}
+        for position, doc in enumerate(loaded):
+            if doc:
+                docs[doc['slug']] = doc
+                self._cache_doc(doc['slug'], doc, pipe)
+
+                category = doc['category']
+                # Category order comes from the first document in it
+                if category not in category_orders:
+                    category_orders[category] = doc['meta'].get(
+                        'category_order', 999)
+                heapq.heappush(heaps.setdefault(category, []), (
+                    doc['order'], doc['title'], position, {
+                        'slug': doc['slug'],
+                        'title': doc['title'],
+                        'order': doc['order']
+                    }
+                ))
+
+        # Categories by category_order and name, docs popped in order
+        tree = {}
+        for category in sorted(
+            heaps, key=lambda name: (category_orders.get(name, 999), name)
+        ):
+            heap = heaps[category]
+            tree[category] = [heapq.heappop(heap)[-1] for _ in range(len(heap))]
+        self._cache_category_tree(tree, pipe)
+
+        try:
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error caching docs in Redis: {str(e)}")
+
+        self.loaded_docs = docs
+        self.loaded_signature = signature
+        return docs
+
+    @staticmethod
+    def _entry_version(entry: os.DirEntry) -> Optional[Tuple[int, int]]:
+        """(st_mtime_ns, st_size) of a directory entry, None if unreadable."""
+        try:
+            stat = entry.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _load_file(self, app, docs_path: Path,
+                   entry: os.DirEntry) -> Optional[dict]:
+        """Load a single markdown file from a worker thread."""
+        file_path = Path(entry.path)
+        with app.app_context():
             try:
                 relative_path = file_path.relative_to(docs_path)
                 slug = str(relative_path.with_suffix('')).replace('\\', '/')
 
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-
-                # Parse frontmatter and content
-                front_matter, content = self._parse_frontmatter(content)
+                return self._load_doc(slug, file_path, entry.stat())
 
-                # Process content
-                content = self._process_content(content)
+            except Exception as e:
+                logger.error(f"Error loading markdown file {
+                             file_path}: {str(e)}")
+                return None
 
-                # Convert markdown to HTML
-                self.md.reset()
-                html_content = self.md.convert(content)
-                html_content = self._add_css_classes(html_content)
+    def _load_doc(self, slug: str, file_path: Path,
+                  stat: Optional[os.stat_result] = None) -> dict:
+        """Render a document, reusing an earlier render if the file is unchanged."""
+        stat = stat or file_path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
 
-                doc = {
-                    'slug': slug,
-                    'title': front_matter.get('title', slug),
-                    'category': front_matter.get('category', 'Uncategorized'),
-                    'order': front_matter.get('order', 999),
-                    'content': html_content,
-                    'toc': getattr(self.md, 'toc', ''),
-                    'meta': front_matter
-                }
+        rendered = _rendered_docs.get(slug)
+        if rendered and rendered[0] == version:
+            return rendered[1]
 
-                docs[slug] = doc
-                self._cache_doc(slug, doc)
+        cache_key = f"{_CACHE_PREFIX}:rendered:{slug}:{version[0]}:{version[1]}"
+        doc = None
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                doc = pickle.loads(cached)
+        except Exception as e:
+            logger.error(f"Error getting rendered doc from Redis: {str(e)}")
 
+        if doc is None:
+            doc = self._render_doc(slug, file_path)
+            try:
+                redis_client.setex(
+                    cache_key,
+                    current_app.config.get('DOCS_RENDER_CACHE_TTL',
+                                           self.RENDER_CACHE_TTL),
+                    pickle.dumps(doc, protocol=_PICKLE_PROTOCOL)
+                )
             except Exception as e:
-                logger.error(f"Error loading markdown file {
-                             file_path}: {str(e)}")
-                continue
+                logger.error(f"Error caching rendered doc in Redis: {str(e)}")
 
-        return docs
+        _rendered_docs[slug] = (version, doc)
+        return doc
+
+    def _render_doc(self, slug: str, file_path: Path) -> dict:
+        """Read a markdown file and render it to HTML."""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        # Parse frontmatter and content
+        front_matter, content = self._parse_frontmatter(content)
+
+        # Process content
+        content = self._process_content(content)
+
+        # Convert markdown to HTML
+        self.md.reset()
+        html_content = self.md.convert(content)
+        html_content = self._add_css_classes(html_content)
+
+        return {
+            'slug': slug,
+            'title': front_matter.get('title', slug),
+            'category': front_matter.get('category', 'Uncategorized'),
+            'order': front_matter.get('order', 999),
+            'content': html_content,
+            'toc': getattr(self.md, 'toc', ''),
+            'meta': front_matter
+        }
 
     def _parse_frontmatter(self, content: str) -> tuple[dict, str]:
         """Parse frontmatter and content from a markdown file."""
@@ -214,17 +369,18 @@ class DocsLoader:
             return {}, content
 
         try:
-            # Split on frontmatter markers, handling potential spaces
-            parts = content.split('---')
+            # Split on the first two frontmatter markers only; the body may
+            # contain its own horizontal rules
+            parts = content.split('---', 2)
             if len(parts) < 3:
                 return {}, content
 
-            # Get the frontmatter content (second part) and remaining content (third part onwards)
+            # Get the frontmatter content (second part) and remaining content
             frontmatter = parts[1].strip()
-            content = '---'.join(parts[2:]).strip()
+            content = parts[2].strip()
 
             # Parse the frontmatter
-            metadata = yaml.safe_load(frontmatter)
+            metadata = yaml.load(frontmatter, Loader=_YamlLoader)
             if not metadata:
                 return {}, content
 
@@ -248,14 +404,20 @@ class DocsLoader:
             # Return empty frontmatter and original content on error
             return {}, content
 
-    def _cache_doc(self, slug: str, doc: dict) -> None:
-        """Cache a document in both memory and Redis."""
+    def _cache_doc(self, slug: str, doc: dict, pipe=None) -> None:
+        """Cache a document in both memory and Redis.
+
+        Args:
+            slug: Document slug
+            doc: Rendered document
+            pipe: Optional Redis pipeline to queue the write on
+        """
         self.docs_cache[slug] = doc
         try:
-            redis_client.setex(
-                f"docs:{slug}",
+            (pipe or redis_client).setex(
+                f"{_CACHE_PREFIX}:{slug}",
                 current_app.config.get('DOCS_CACHE_TTL', 3600),
-                json.dumps(doc)
+                pickle.dumps(doc, protocol=_PICKLE_PROTOCOL)
             )
         except Exception as e:
             logger.error(f"Error caching doc in Redis: {str(e)}")
@@ -266,9 +428,9 @@ class DocsLoader:
             return self.docs_cache[slug]
 
         try:
-            cached = redis_client.get(f"docs:{slug}")
+            cached = redis_client.get(f"{_CACHE_PREFIX}:{slug}")
             if cached:
-                doc = json.loads(cached)
+                doc = pickle.loads(cached)
                 self.docs_cache[slug] = doc
                 return doc
         except Exception as e:
@@ -287,89 +449,98 @@ class DocsLoader:
 
     def _get_title(self, content: str) -> str:
         """Extract title from content."""
-        match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+        match = _RE_TITLE.search(content)
         return match.group(1) if match else ''
 
-    def get_category_tree(self) -> Dict[str, List[Dict]]:
-        """Get documentation organized by categories."""
-        docs = self.load_docs()
-        tree = {}
-
-        for doc in docs.values():
-            category = doc['category']
-            if category not in tree:
-                tree[category] = []
-            tree[category].append({
-                'slug': doc['slug'],
-                'title': doc['title'],
-                'order': doc['order']
-            })
-
-        # Sort categories and docs within categories
-        for category in tree.values():
-            category.sort(key=lambda x: (x['order'], x['title']))
-
-        return dict(sorted(tree.items()))
-
     def search_docs(self, query: str) -> List[Dict]:
         """Search documentation."""
         docs = self.load_docs()
         results = []
+        needle = query.lower()
+
+        # A query made of word characters can only occur inside a single
+        # word, so only docs containing a word that contains it can match
+        candidates = None
+        if _RE_WORD.fullmatch(needle):
+            index = self._get_search_index(docs)
+            candidates = set()
+            for word, slugs in index.items():
+                if needle in word:
+                    candidates |= slugs
 
         for doc in docs.values():
-            if (query.lower() in doc['title'].lower() or
-                    query.lower() in doc['content'].lower()):
+            if candidates is not None and doc['slug'] not in candidates:
+                continue
+            title, text, text_lower = self._get_search_text(doc)
+            if needle in title or needle in text_lower:
                 results.append({
                     'slug': doc['slug'],
                     'title': doc['title'],
                     'category': doc['category'],
-                    'excerpt': self._get_excerpt(doc['content'], query)
+                    'excerpt': self._get_excerpt(text, text_lower, needle)
                 })
 
         return results
 
-    def get_category_tree(self) -> Dict[str, List[Dict]]:
-        """Get documentation organized by categories with proper ordering."""
-        docs = self.load_docs()
-        tree = {}
-        category_orders = {}  # Store category orders
+    def _get_search_index(self, docs: Dict[str, Dict]) -> Dict[str, set]:
+        """Map each lowercased word in titles and text to the slugs using it."""
+        if self.search_index and self.search_index[0] is docs:
+            return self.search_index[1]
 
-        # First pass: collect categories and their orders
+        index = {}
         for doc in docs.values():
-            category = doc['category']
-            # Get category order from any document in the category
-            if category not in category_orders:
-                category_orders[category] = doc['meta'].get(
-                    'category_order', 999)
-
-            if category not in tree:
-                tree[category] = []
-
-            tree[category].append({
-                'slug': doc['slug'],
-                'title': doc['title'],
-                'order': doc['order']
-            })
-
-        # Sort documents within each category
-        for category in tree:
-            tree[category].sort(key=lambda x: (x['order'], x['title']))
-
-        # Convert to sorted list of tuples and then back to dict to maintain order
-        sorted_categories = sorted(
-            tree.items(),
-            key=lambda x: (
-                category_orders.get(x[0], 999),  # First sort by category_order
-                x[0]  # Then by category name
+            title, _, text_lower = self._get_search_text(doc)
+            words = set(_RE_WORD.findall(title))
+            words.update(_RE_WORD.findall(text_lower))
+            for word in words:
+                index.setdefault(word, set()).add(doc['slug'])
+
+        self.search_index = (docs, index)
+        return index
+
+    def _get_search_text(self, doc: dict) -> Tuple[str, str, str]:
+        """Lowercased title plus plain and lowercased plain text of a doc.
+
+        Tags are stripped once per rendered doc rather than per search.
+        """
+        cached = self.search_cache.get(doc['slug'])
+        if cached and cached[0] is doc:
+            return cached[1:]
+
+        text = _RE_STRIP_TAGS.sub('', doc['content'])
+        entry = (doc, doc['title'].lower(), text, text.lower())
+        self.search_cache[doc['slug']] = entry
+        return entry[1:]
+
+    def _cache_category_tree(self, tree: Dict[str, List[Dict]],
+                             pipe=None) -> None:
+        """Cache the category tree in both memory and Redis."""
+        self.category_tree = tree
+        try:
+            (pipe or redis_client).setex(
+                f"{_CACHE_PREFIX}:tree",
+                current_app.config.get('DOCS_CACHE_TTL', 3600),
+                pickle.dumps(tree, protocol=_PICKLE_PROTOCOL)
             )
-        )
+        except Exception as e:
+            logger.error(f"Error caching category tree in Redis: {str(e)}")
+
+    def get_category_tree(self) -> Dict[str, List[Dict]]:
+        """Get documentation organized by categories with proper ordering."""
+        try:
+            cached = redis_client.get(f"{_CACHE_PREFIX}:tree")
+            if cached:
+                return pickle.loads(cached)
+        except Exception as e:
+            logger.error(f"Error getting category tree from Redis: {str(e)}")
 
-        return dict(sorted_categories)
+        self.load_docs()
+        return self.category_tree
 
-    def _get_excerpt(self, content: str, query: str, length: int = 200) -> str:
-        """Get a relevant excerpt from content containing the query."""
-        text = re.sub(r'<[^>]+>', '', content)
-        pos = text.lower().find(query.lower())
+    def _get_excerpt(self, text: str, text_lower: str, needle: str,
+                     length: int = 200) -> str:
+        """Get a relevant excerpt from plain text containing the query."""
+        pos = text_lower.find(needle)
 
         if pos == -1:
             return text[:length] + '...'
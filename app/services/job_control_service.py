@@ -1,7 +1,12 @@
+import json
 from typing import Dict, Any, Optional, List
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
+from sqlalchemy import func, literal, update
+from sqlalchemy.dialects.postgresql import JSONB
 from app.extensions import db, redis_client
-from app.models import EmailJob, EmailDelivery
+from app.models import EmailJob, EmailDelivery, AuditLog
+from app.models.audit import serialize_value
 from app.utils.logging import logger
 from app.services.webhook_service import WebhookService
 
@@ -10,14 +15,21 @@ class JobControlService:
     """Service for controlling and tracking email jobs."""
 
     JOB_CONTROL_PREFIX = "email_job_control:"
+    PROGRESS_CACHE_PREFIX = "job_progress:"
+    PROGRESS_CACHE_TTL = 3  # seconds; counts only move at worker tick rate
 
     def get_job_progress(self, job_id: int, user_id: int) -> Dict[str, Any]:
         """Get detailed progress information for a job."""
-        job = EmailJob.query.filter(
-            EmailJob.id == job_id,
-            EmailJob.user_id == user_id
-        ).first()
-        if not job:
+        cache_key = self._get_progress_key(job_id, user_id)
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                return json.loads(cached)
+        except Exception as e:
+            logger.error(f"Error reading cached progress for job {job_id}: {str(e)}")
+
+        job = db.session.get(EmailJob, job_id)
+        if not job or job.user_id != user_id:
             raise ValueError("Job not found")
 
         # Get all deliveries grouped by status
@@ -27,6 +39,48 @@ class JobControlService:
         ).filter_by(job_id=job_id).group_by(EmailDelivery.status).all()
 
         stats = {status: count for status, count in delivery_stats}
+        progress = self._build_progress(job, stats, self.is_job_paused(job_id))
+
+        try:
+            redis_client.setex(
+                cache_key, self.PROGRESS_CACHE_TTL, json.dumps(progress))
+        except Exception as e:
+            logger.error(f"Error caching progress for job {job_id}: {str(e)}")
+
+        return progress
+
+    def get_job_progress_bulk(self, jobs: List[EmailJob]) -> List[Dict[str, Any]]:
+        """Get progress information for several jobs in one query."""
+        if not jobs:
+            return []
+
+        ids = [job.id for job in jobs]
+
+        # Delivery counts for every job, grouped by job and status
+        delivery_stats = db.session.query(
+            EmailDelivery.job_id,
+            EmailDelivery.status,
+            db.func.count(EmailDelivery.id)
+        ).filter(
+            EmailDelivery.job_id.in_(ids)
+        ).group_by(EmailDelivery.job_id, EmailDelivery.status).all()
+
+        stats = defaultdict(dict)
+        for job_id, status, count in delivery_stats:
+            stats[job_id][status] = count
+
+        # Pause flags for every job in a single round-trip
+        paused = self.are_jobs_paused(ids)
+
+        return [
+            self._build_progress(job, stats[job.id], paused[job.id])
+            for job in jobs
+        ]
+
+    @staticmethod
+    def _build_progress(job: EmailJob, stats: Dict[str, int],
+                        is_paused: bool) -> Dict[str, Any]:
+        """Build the progress payload for a job from its delivery counts."""
         total = job.recipient_count or 0
 
         return {
@@ -35,7 +89,8 @@ class JobControlService:
             'tracking_id': job.tracking_id,
             'progress': {
                 'total': total,
-                'pending': stats.get('pending', 0),
+                # Deliveries claimed by a worker are still waiting to send
+                'pending': stats.get('pending', 0) + stats.get('sending', 0),
                 'sent': stats.get('sent', 0),
                 'failed': stats.get('failed', 0),
                 'percentage': round((stats.get('sent', 0) / total * 100), 2) if total > 0 else 0
@@ -43,7 +98,7 @@ class JobControlService:
             'created_at': job.created_at.isoformat(),
             'started_at': job.started_at.isoformat() if job.started_at else None,
             'completed_at': job.completed_at.isoformat() if job.completed_at else None,
-            'is_paused': self.is_job_paused(job_id),
+            'is_paused': is_paused,
             'template_id': job.template_id,
             'campaign_id': job.campaign_id,
             'meta_data': job.meta_data
@@ -54,30 +109,95 @@ class JobControlService:
         """Get Redis key for job control."""
         return f"{JobControlService.JOB_CONTROL_PREFIX}{job_id}"
 
+    @staticmethod
+    def _get_progress_key(job_id: int, user_id: int) -> str:
+        """Get Redis key for a cached progress snapshot."""
+        return f"{JobControlService.PROGRESS_CACHE_PREFIX}{job_id}:{user_id}"
+
+    @staticmethod
+    def invalidate_job_progress(job_id: int, user_id: int) -> None:
+        """Drop the cached progress snapshot after a job or delivery changes."""
+        try:
+            redis_client.delete(
+                JobControlService._get_progress_key(job_id, user_id))
+        except Exception as e:
+            logger.error(f"Error invalidating progress for job {job_id}: {str(e)}")
+
+    @staticmethod
+    def _transition_job(job_id: int, user_id: int, condition, status: str,
+                        meta: Dict[str, Any], **values) -> bool:
+        """Atomically move a job to a new status if it matches condition.
+
+        The UPDATE bypasses the ORM, so the audit row audit_after_flush
+        would write is added here; it is committed with the caller's
+        transaction.
+
+        Args:
+            job_id: ID of the job
+            user_id: ID of the job owner
+            condition: Extra WHERE clause on the current job state
+            status: New job status
+            meta: Keys merged into the job's meta_data
+            **values: Additional columns to set
+
+        Returns:
+            bool: True if the job was updated
+        """
+        stmt = update(EmailJob).where(
+            EmailJob.id == job_id,
+            EmailJob.user_id == user_id,
+            condition
+        ).values(
+            status=status,
+            meta_data=func.coalesce(
+                EmailJob.meta_data, literal({}, JSONB)
+            ).op('||')(literal(meta, JSONB)),
+            **values
+        ).returning(
+            EmailJob.status, EmailJob.meta_data, EmailJob.updated_by,
+            *(getattr(EmailJob, column) for column in values)
+        ).execution_options(synchronize_session=False)
+
+        row = db.session.execute(stmt).first()
+        if row is None:
+            return False
+
+        changes = {'status': row.status, 'meta_data': row.meta_data}
+        changes.update((column, row._mapping[column]) for column in values)
+        db.session.add(AuditLog(
+            model_name=EmailJob.__name__,
+            record_id=job_id,
+            operation='UPDATE',
+            changes={column: serialize_value(value)
+                     for column, value in changes.items()},
+            user_id=row.updated_by
+        ))
+        return True
+
     @staticmethod
     def pause_job(job_id: int, user_id: int) -> bool:
         """Pause an ongoing email job."""
         try:
-            job = EmailJob.query.filter(
-                EmailJob.id == job_id,
-                EmailJob.user_id == user_id
-            ).first()
-            if not job or job.status not in ['pending', 'processing']:
+            # Update job status
+            paused = JobControlService._transition_job(
+                job_id, user_id,
+                EmailJob.status.in_(['pending', 'processing']),
+                'paused',
+                {
+                    'paused_at': datetime.now(timezone.utc).isoformat(),
+                    'pause_reason': 'user_requested'
+                }
+            )
+            if not paused:
+                db.session.rollback()
                 return False
+            db.session.commit()
+            JobControlService.invalidate_job_progress(job_id, user_id)
 
             # Set pause flag in Redis
             redis_client.set(
                 JobControlService._get_control_key(job_id), 'paused')
 
-            # Update job status
-            job.status = 'paused'
-            job.meta_data = {
-                **(job.meta_data or {}),
-                'paused_at': datetime.now(timezone.utc).isoformat(),
-                'pause_reason': 'user_requested'
-            }
-            db.session.commit()
-
             # Notify via webhook
             webhook_service = WebhookService()
             webhook_service.notify_job_status(job_id, 'paused')
@@ -85,6 +205,7 @@ class JobControlService:
             return True
 
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error pausing job {job_id}: {str(e)}")
             return False
 
@@ -92,24 +213,22 @@ class JobControlService:
     def resume_job(job_id: int, user_id: int) -> bool:
         """Resume a paused email job."""
         try:
-            job = EmailJob.query.filter(
-                EmailJob.id == job_id,
-                EmailJob.user_id == user_id
-            ).first()
-            if not job or job.status != 'paused':
+            # Update job status
+            resumed = JobControlService._transition_job(
+                job_id, user_id,
+                EmailJob.status == 'paused',
+                'processing',
+                {'resumed_at': datetime.now(timezone.utc).isoformat()}
+            )
+            if not resumed:
+                db.session.rollback()
                 return False
+            db.session.commit()
+            JobControlService.invalidate_job_progress(job_id, user_id)
 
             # Remove pause flag
             redis_client.delete(JobControlService._get_control_key(job_id))
 
-            # Update job status
-            job.status = 'processing'
-            job.meta_data = {
-                **(job.meta_data or {}),
-                'resumed_at': datetime.now(timezone.utc).isoformat()
-            }
-            db.session.commit()
-
             # Requeue remaining deliveries
             from app.tasks.email_tasks import process_email_batch
             process_email_batch.delay(job_id)
@@ -121,6 +240,7 @@ class JobControlService:
             return True
 
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error resuming job {job_id}: {str(e)}")
             return False
 
@@ -128,36 +248,39 @@ class JobControlService:
     def stop_job(job_id: int, user_id: int, reason: str = 'user_requested') -> bool:
         """Stop an email job (cannot be resumed)."""
         try:
-            job = EmailJob.query.filter(
-                EmailJob.id == job_id,
-                EmailJob.user_id == user_id
-            ).first()
-            if not job or job.status in ['completed', 'failed', 'stopped']:
-                return False
-
-            # Set stop flag
-            redis_client.set(
-                JobControlService._get_control_key(job_id), 'stopped')
+            now = datetime.now(timezone.utc)
 
             # Update job status
-            job.status = 'stopped'
-            job.completed_at = datetime.now(timezone.utc)
-            job.meta_data = {
-                **(job.meta_data or {}),
-                'stopped_at': datetime.now(timezone.utc).isoformat(),
-                'stop_reason': reason
-            }
-
-            # Mark remaining deliveries as cancelled
-            EmailDelivery.query.filter_by(
-                job_id=job_id,
-                status='pending'
+            stopped = JobControlService._transition_job(
+                job_id, user_id,
+                EmailJob.status.notin_(['completed', 'failed', 'stopped']),
+                'stopped',
+                {
+                    'stopped_at': now.isoformat(),
+                    'stop_reason': reason
+                },
+                completed_at=now
+            )
+            if not stopped:
+                db.session.rollback()
+                return False
+
+            # Mark remaining deliveries as cancelled in the same transaction;
+            # live workers cancel their own claims, dead ones' have expired
+            EmailDelivery.query.filter(
+                EmailDelivery.job_id == job_id,
+                EmailDelivery.claimable()
             ).update({
                 'status': 'cancelled',
                 'error_message': 'Job stopped by user'
-            })
+            }, synchronize_session=False)
 
             db.session.commit()
+            JobControlService.invalidate_job_progress(job_id, user_id)
+
+            # Set stop flag
+            redis_client.set(
+                JobControlService._get_control_key(job_id), 'stopped')
 
             # Notify via webhook
             webhook_service = WebhookService()
@@ -166,18 +289,41 @@ class JobControlService:
             return True
 
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error stopping job {job_id}: {str(e)}")
             return False
 
+    @staticmethod
+    def _flag_is(value, flag: str) -> bool:
+        """Compare a Redis control flag, whether or not responses are decoded."""
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value == flag
+
     @staticmethod
     def is_job_paused(job_id: int) -> bool:
         """Check if a job is paused."""
-        return redis_client.get(JobControlService._get_control_key(job_id)) == 'paused'
+        return JobControlService._flag_is(
+            redis_client.get(JobControlService._get_control_key(job_id)), 'paused')
 
     @staticmethod
     def is_job_stopped(job_id: int) -> bool:
         """Check if a job is stopped."""
-        return redis_client.get(JobControlService._get_control_key(job_id)) == 'stopped'
+        return JobControlService._flag_is(
+            redis_client.get(JobControlService._get_control_key(job_id)), 'stopped')
+
+    @staticmethod
+    def are_jobs_paused(job_ids: List[int]) -> Dict[int, bool]:
+        """Check the pause flag of several jobs with a single MGET."""
+        if not job_ids:
+            return {}
+
+        flags = redis_client.mget(
+            [JobControlService._get_control_key(i) for i in job_ids])
+        return {
+            job_id: JobControlService._flag_is(flag, 'paused')
+            for job_id, flag in zip(job_ids, flags)
+        }
 
     @staticmethod
     def get_active_jobs(user_id: int) -> List[Dict[str, Any]]:
@@ -187,9 +333,7 @@ class JobControlService:
             EmailJob.status.in_(['pending', 'processing', 'paused'])
         ).all()
 
-        job_control = JobControlService()
-
-        return [job_control.get_job_progress(job.id, user_id) for job in active_jobs]
+        return JobControlService().get_job_progress_bulk(active_jobs)
 
     @staticmethod
     def cleanup_stale_jobs() -> int:
@@ -202,7 +346,7 @@ class JobControlService:
 
         count = 0
         for job in stale_jobs:
-            if JobControlService.stop_job(job.id, reason='stale_job'):
+            if JobControlService.stop_job(job.id, job.user_id, reason='stale_job'):
                 count += 1
 
         return count
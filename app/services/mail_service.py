@@ -1,33 +1,80 @@
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterable, Iterator
+from collections import deque
+import io
+import os
 import smtplib
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from email.generator import BytesGenerator
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from app.extensions import db
+from email.utils import parseaddr
+from app.extensions import db, redis_client
 from app.models import (
     SMTPConfiguration, User, Template,
     EmailDelivery, EmailJob
 )
-from app.utils.encryption import decrypt_value
+from app.utils.encryption import decrypt_value_cached
 from flask import current_app
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import sqlalchemy.exc
+from redis.exceptions import WatchError
+from sqlalchemy import case, func, insert, or_, select, update
 from app.services.template_service import TemplateRenderService
 from app.services.smtp_service import SMTPService
-from app.utils.roles import ROLE_CONFIGURATIONS, ResourceLimit
+from app.services.smtp_pool import SMTPConnectionPool, smtp_pool
+from app.services.quota_service import QuotaService
+from app.utils.roles import ROLE_DAILY_EMAIL_LIMITS
 from app.utils.logging import logger
 import uuid
 
 
+# Stands in for the recipient in messages serialized once per body
+_TO_PLACEHOLDER = '__TO__'
+
+# Add to a counter only if it is already there; a missing one is rebuilt.
+# Bumping KEYS[2] tells a rebuild in flight that its total is already stale.
+_INCRBY_IF_EXISTS = (
+    "redis.call('INCR', KEYS[2]) "
+    "redis.call('EXPIRE', KEYS[2], ARGV[2]) "
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return nil"
+)
+
+
+def _tracking_ids(count: int) -> List[str]:
+    """Random 32-character hex tracking IDs, read from urandom in one call."""
+    pool = os.urandom(16 * count).hex()
+    return [pool[i:i + 32] for i in range(0, 32 * count, 32)]
+
+
 class MailService:
     """Core service for email sending operations."""
 
+    # Sends a campaign batch keeps in flight, each on its own SMTP session
+    BULK_SEND_CONCURRENCY = 4
+    JOB_RECIPIENTS_TTL = 36 * 3600  # seconds; outlives the day it counts
+
     def __init__(self):
         self.template_renderer = TemplateRenderService()
 
     @staticmethod
     def get_smtp_config(user_id: int) -> Optional[SMTPConfiguration]:
         """Get the default or first active SMTP configuration for a user."""
-        return SMTPConfiguration.query.filter_by(
+        cache_key = SMTPService.get_default_config_cache_key(user_id)
+        try:
+            cached_id = redis_client.get(cache_key)
+        except Exception as e:
+            logger.error(f"Error reading cached SMTP config for user {user_id}: {str(e)}")
+            cached_id = None
+
+        # A PK lookup is served from the identity map within a session
+        if cached_id:
+            config = db.session.get(SMTPConfiguration, int(cached_id))
+            if config and config.user_id == user_id and config.is_active:
+                return config
+
+        config = SMTPConfiguration.query.filter_by(
             user_id=user_id,
             is_active=True,
             is_default=True
@@ -36,6 +83,14 @@ class MailService:
             is_active=True
         ).first()
 
+        if config:
+            try:
+                redis_client.setex(
+                    cache_key, SMTPService.DEFAULT_CONFIG_CACHE_TTL, config.id)
+            except Exception as e:
+                logger.error(f"Error caching SMTP config for user {user_id}: {str(e)}")
+        return config
+
     def send_raw_email(
         self,
         user_id: Optional[int],
@@ -49,117 +104,375 @@ class MailService:
         Send a raw email (no template).
         Core method for sending both system and user emails.
         """
-        try:
-            logger.info(f"Starting email send process to {to_email}")
-
-            # Ensure body is a string, not bytes
-            if isinstance(body, bytes):
-                body = body.decode('utf-8')
-
-            # Handle system vs user email configuration
-            if not is_system_email:
-                user = User.query.get(user_id)
-                if not user:
-                    return False, "User not found"
+        logger.info("Starting email send process to %s", to_email)
+        message = {'to_email': to_email, 'subject': subject, 'body': body}
+        _, success, error = list(self.send_emails_bulk(
+            user_id, [message], smtp_config, is_system_email))[0]
+        return success, error
 
-                # Get user's SMTP config if not provided
-                if not smtp_config:
-                    smtp_config = self.get_smtp_config(user_id)
-                    if not smtp_config:
-                        return False, "No active SMTP configuration found"
-
-                # Lock the SMTP config for update to prevent race conditions
-                smtp_config = db.session.query(
-                    SMTPConfiguration).with_for_update().get(smtp_config.id)
-
-                logger.info(f"Current SMTP stats - emails_sent_today: {
-                            smtp_config.emails_sent_today}, last_reset_date: {smtp_config.last_reset_date}")
-                logger.info(f"Current UTC date: {
-                            datetime.now(timezone.utc).date()}")
-
-                # Check daily limits for user SMTPs
-                if smtp_config.needs_daily_reset():
-                    logger.info("Resetting daily counter to 0")
-                    smtp_config.emails_sent_today = 0
-                    smtp_config.last_reset_date = datetime.now(
-                        timezone.utc).date()
-                elif not smtp_config.can_send_emails():
-                    return False, f"Daily email limit ({smtp_config.daily_limit}) reached"
-
-                from_email = smtp_config.from_email or user.email
-
-            else:
-                # System email - must provide smtp_config
-                if not smtp_config:
-                    return False, "SMTP configuration required for system emails"
-
-                from_email = smtp_config.from_email
-
-            # Prepare email message
-            msg = MIMEMultipart()
-
-            # If from_email formatting
-            if '<' in from_email and '>' in from_email:
-                msg['From'] = from_email
-                current_app.logger.debug(
-                    f"Using formatted from_email: {from_email}")
-            else:
-                display_name = "Mailsage Support" if is_system_email else None
-                from_header = f"{display_name} <{from_email}>" if display_name else from_email
-                msg['From'] = from_header
-                current_app.logger.debug(
-                    f"Constructed from_email: {from_header}")
-
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'html'))
-
-            # Attempt SMTP connection
-            current_app.logger.info("Establishing SMTP connection...")
-            with smtplib.SMTP(
-                smtp_config.host,
-                smtp_config.port,
-                timeout=30
-            ) as smtp:
-                if smtp_config.use_tls:
-                    current_app.logger.debug("Starting TLS...")
-                    smtp.starttls()
-
-                current_app.logger.debug("Attempting SMTP login...")
+    def send_emails_bulk(
+        self,
+        user_id: Optional[int],
+        messages: Iterable[Dict[str, Any]],
+        smtp_config: Optional[SMTPConfiguration] = None,
+        is_system_email: bool = False,
+        noop_interval: int = 50,
+        concurrency: int = 1
+    ) -> Iterator[Tuple[Dict[str, Any], bool, Optional[str]]]:
+        """
+        Send raw emails over pooled SMTP sessions.
+
+        Args:
+            user_id: ID of the sending user (None for system emails)
+            messages: Dicts with to_email, subject and body; consumed lazily
+            smtp_config: SMTP configuration to use, defaults to the user's
+            is_system_email: Whether this is a system email
+            noop_interval: Send a NOOP every this many messages
+            concurrency: Sends kept in flight at once, each on its own
+            session; capped by the pool's per-server connection limit
+
+        Yields:
+            Tuple[Dict, bool, Optional[str]]: (message, success, error) for
+            each message, in order
+        """
+        password = None
+        try:
+            smtp_config, from_email, error = self._resolve_sender(
+                user_id, smtp_config, is_system_email)
+            if not error:
                 # For user SMTP, decrypt the password. For system SMTP, use as is.
-                password = smtp_config.password if is_system_email else decrypt_value(
+                password = smtp_config.password if is_system_email else decrypt_value_cached(
                     smtp_config.password)
                 if not password:
                     raise ValueError("Invalid SMTP password")
+        except Exception as e:
+            error = self._handle_email_error(e, smtp_config)
+
+        if error:
+            for message in messages:
+                yield message, False, error
+            return
+
+        if not is_system_email:
+            # Read once; the config row is expired by every commit below
+            config_id = smtp_config.id
+            daily_limit = smtp_config.daily_limit
+            sent_today = 0 if smtp_config.needs_daily_reset() \
+                else smtp_config.emails_sent_today or 0
+            failure_count = smtp_config.failure_count
+        # Plain copy of the server settings for the sending threads, which
+        # must not touch the session-bound config
+        server = SimpleNamespace(
+            host=smtp_config.host, port=smtp_config.port,
+            username=smtp_config.username, use_tls=smtp_config.use_tls)
+
+        prebuilt_key = prebuilt = envelope_from = None
+        idle = []  # sessions checked out by this call and free to reuse
+        pending = deque()  # (message, future, reserved, error) in send order
+        workers = max(1, min(concurrency, smtp_pool.MAX_CONNECTIONS))
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        def deliver(from_addr: Optional[str], to_email: str, msg) -> None:
+            # Runs on a sending thread with a session no other send is using
+            conn = None
+            try:
+                # Another thread may take the last idle session first
+                try:
+                    conn = idle.pop()
+                except IndexError:
+                    pass
+                # Reuse a pooled session; reconnect if the server dropped it
+                try:
+                    if conn is None:
+                        conn = smtp_pool.acquire(server, password)
+                    elif conn.sent and conn.sent % noop_interval == 0:
+                        conn.smtp.noop()
+                    logger.debug("Sending email message...")
+                    self._send(conn.smtp, from_addr, to_email, msg)
+                except smtplib.SMTPServerDisconnected:
+                    logger.info("SMTP connection lost, reconnecting...")
+                    if conn is not None:
+                        smtp_pool.release(conn, healthy=False)
+                        conn = None
+                    conn = smtp_pool.acquire(server, password)
+                    self._send(conn.smtp, from_addr, to_email, msg)
+            except Exception as e:
+                # Don't hand a broken session back to the pool; refused
+                # recipients and other SMTP replies leave it usable, but a
+                # 421 means the server is closing the channel
+                broken = isinstance(e, smtplib.SMTPServerDisconnected) or (
+                    isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)) or (
+                    isinstance(e, smtplib.SMTPResponseException) and e.smtp_code == 421)
+                if conn is not None:
+                    if broken:
+                        smtp_pool.release(conn, healthy=False)
+                    else:
+                        idle.append(conn)
+                raise
+            conn.sent += 1
+            idle.append(conn)
+
+        def finish(entry) -> Tuple[Dict[str, Any], bool, Optional[str]]:
+            nonlocal failure_count
+            message, future, reserved, error = entry
+            if future is not None:
+                try:
+                    future.result()
+                    current_app.logger.debug("Email sent successfully")
+
+                    # Clear failures through the ORM so health counters follow
+                    if not is_system_email and failure_count:
+                        smtp_config.failure_count = failure_count = 0
+                        db.session.commit()
+                        current_app.logger.debug("Updated user SMTP statistics")
+                except Exception as e:
+                    if reserved:
+                        self._release_send(config_id, reserved)
+                    error = self._handle_email_error(e, smtp_config)
+            return message, error is None, error
+
+        def submit(message: Dict[str, Any]) -> tuple:
+            nonlocal prebuilt_key, prebuilt, envelope_from
+            reserved = None
+            try:
+                # Claim a slot in the daily limit for user SMTPs
+                if not is_system_email:
+                    reserved = self._reserve_send(
+                        config_id, daily_limit, sent_today)
+                    if not reserved:
+                        return (message, None, None,
+                                f"Daily email limit ({daily_limit}) reached")
+
+                # Serialize each distinct subject/body once; only To differs
+                to_email = message['to_email']
+                if to_email.isascii() and to_email.isprintable():
+                    key = (message['subject'], message['body'])
+                    if key != prebuilt_key:
+                        skeleton = self._build_message(
+                            from_email,
+                            {**message, 'to_email': _TO_PLACEHOLDER},
+                            is_system_email)
+                        envelope_from = parseaddr(skeleton['From'])[1]
+                        prebuilt = self._serialize_message(skeleton)
+                        prebuilt_key = key
+                    msg = prebuilt.replace(
+                        f"To: {_TO_PLACEHOLDER}\r\n".encode(),
+                        f"To: {to_email}\r\n".encode(), 1)
+                else:
+                    msg = self._build_message(
+                        from_email, message, is_system_email)
+
+                # Overlap round trips across sessions when allowed
+                if executor is not None:
+                    future = executor.submit(
+                        deliver, envelope_from, to_email, msg)
+                else:
+                    future = Future()
+                    try:
+                        deliver(envelope_from, to_email, msg)
+                        future.set_result(None)
+                    except Exception as e:
+                        future.set_exception(e)
+                return message, future, reserved, None
+
+            except Exception as e:
+                if reserved:
+                    self._release_send(config_id, reserved)
+                return message, None, None, self._handle_email_error(e, smtp_config)
 
-                smtp.login(
-                    smtp_config.username,
-                    password
-                )
-                current_app.logger.debug("Sending email message...")
-                smtp.send_message(msg)
+        try:
+            for message in messages:
+                pending.append(submit(message))
+                # Report in order, keeping at most `workers` sends in flight
+                while len(pending) >= workers:
+                    yield finish(pending.popleft())
+
+            while pending:
+                yield finish(pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            while idle:
+                smtp_pool.release(idle.pop())
 
-                current_app.logger.info("Email sent successfully")
+    @staticmethod
+    def _reserve_send(config_id: int, daily_limit: int,
+                      sent_today: int) -> Optional[str]:
+        """
+        Count a send against an SMTP config's daily limit before it happens.
 
-                # Update stats only for user SMTPs
-                if not is_system_email:
-                    current_app.logger.info(
-                        f"Before increment - emails_sent_today: {smtp_config.emails_sent_today}")
-                    smtp_config.emails_sent_today += 1
-                    smtp_config.last_used_at = datetime.now(timezone.utc)
-                    smtp_config.failure_count = 0
-                    current_app.logger.info(
-                        f"After increment - emails_sent_today: {smtp_config.emails_sent_today}")
-                    db.session.commit()
-                    current_app.logger.info(
-                        "Committed counter update to database")
-                    current_app.logger.debug("Updated user SMTP statistics")
+        The count lives in a per-day Redis counter, seeded from the row the
+        first time it is used that day and written back by
+        flush_send_counters. If Redis is unavailable the row is updated
+        directly.
 
-                return True, None
+        Args:
+            config_id: ID of the SMTP configuration
+            daily_limit: The configuration's daily limit
+            sent_today: The row's count for today, used to seed the counter
 
+        Returns:
+            'redis' or 'db' for where the slot was claimed, None if the
+            daily limit is reached
+        """
+        now = datetime.now(timezone.utc)
+        key = SMTPService.get_sent_counter_key(config_id, now.date())
+        try:
+            pipe = redis_client.pipeline()
+            pipe.set(key, sent_today, nx=True,
+                     ex=SMTPService.SENT_COUNTER_TTL)
+            pipe.incr(key)
+            pipe.hset(SMTPService.USAGE_LAST_USED_KEY,
+                      config_id, now.timestamp())
+            _, count, _ = pipe.execute()
         except Exception as e:
-            error_msg = self._handle_email_error(e, smtp_config)
-            return False, error_msg
+            logger.error(f"Error counting SMTP send in Redis: {str(e)}")
+            return 'db' if MailService._reserve_send_db(config_id) else None
+
+        if count > daily_limit:
+            try:
+                redis_client.decr(key)
+            except Exception as e:
+                logger.error(f"Error releasing SMTP send slot: {str(e)}")
+            return None
+        return 'redis'
+
+    @staticmethod
+    def _reserve_send_db(config_id: int) -> bool:
+        """
+        Claim a daily limit slot on the config row itself.
+
+        A single conditional UPDATE resets the counter on a new day and
+        increments it only while under the limit, so no row lock is held
+        across the SMTP conversation.
+        """
+        table = SMTPConfiguration.__table__
+        now = datetime.now(timezone.utc)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        needs_reset = or_(table.c.last_reset_date.is_(None),
+                          table.c.last_reset_date < today)
+
+        row = db.session.execute(
+            table.update()
+            .where(table.c.id == config_id,
+                   or_(needs_reset,
+                       table.c.emails_sent_today < table.c.daily_limit))
+            .values(
+                emails_sent_today=case(
+                    (needs_reset, 1),
+                    else_=func.coalesce(table.c.emails_sent_today, 0) + 1),
+                last_reset_date=case(
+                    (needs_reset, today), else_=table.c.last_reset_date),
+                last_used_at=now
+            )
+            .returning(table.c.id)
+        ).first()
+        db.session.commit()
+
+        return row is not None
+
+    @staticmethod
+    def _release_send(config_id: int, reserved: str) -> None:
+        """Give back a daily limit slot claimed for a send that failed."""
+        if reserved == 'redis':
+            try:
+                redis_client.decr(SMTPService.get_sent_counter_key(
+                    config_id, datetime.now(timezone.utc).date()))
+            except Exception as e:
+                logger.error(f"Error releasing SMTP send slot: {str(e)}")
+            return
+
+        table = SMTPConfiguration.__table__
+        try:
+            db.session.execute(
+                table.update()
+                .where(table.c.id == config_id, table.c.emails_sent_today > 0)
+                .values(emails_sent_today=table.c.emails_sent_today - 1)
+            )
+            db.session.commit()
+        except sqlalchemy.exc.SQLAlchemyError as e:
+            db.session.rollback()
+            logger.error(f"Error releasing SMTP send slot: {str(e)}")
+
+    def _resolve_sender(
+        self,
+        user_id: Optional[int],
+        smtp_config: Optional[SMTPConfiguration],
+        is_system_email: bool
+    ) -> Tuple[Optional[SMTPConfiguration], Optional[str], Optional[str]]:
+        """Resolve the SMTP configuration and from address for a send."""
+        # Handle system vs user email configuration
+        if not is_system_email:
+            # Get user's SMTP config if not provided
+            if not smtp_config:
+                smtp_config = self.get_smtp_config(user_id)
+                if not smtp_config:
+                    if not db.session.get(User, user_id):
+                        return None, None, "User not found"
+                    return None, None, "No active SMTP configuration found"
+
+            smtp_config = db.session.get(SMTPConfiguration, smtp_config.id)
+
+            # The config's owner exists by foreign key, so the user row is
+            # only needed for the fallback address or a foreign config
+            if smtp_config.from_email and smtp_config.user_id == user_id:
+                return smtp_config, smtp_config.from_email, None
+
+            user = db.session.get(User, user_id)
+            if not user:
+                return None, None, "User not found"
+
+            return smtp_config, smtp_config.from_email or user.email, None
+
+        # System email - must provide smtp_config
+        if not smtp_config:
+            return None, None, "SMTP configuration required for system emails"
+
+        return smtp_config, smtp_config.from_email, None
+
+    @staticmethod
+    def _build_message(
+        from_email: str,
+        message: Dict[str, Any],
+        is_system_email: bool
+    ) -> MIMEText:
+        """Build the MIME message for a single recipient."""
+        body = message['body']
+
+        # Ensure body is a string, not bytes
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+
+        # Single-part HTML needs no multipart wrapper or boundary
+        msg = MIMEText(body, 'html')
+
+        # If from_email formatting
+        if '<' in from_email and '>' in from_email:
+            msg['From'] = from_email
+        else:
+            display_name = "Mailsage Support" if is_system_email else None
+            from_header = f"{display_name} <{from_email}>" if display_name else from_email
+            msg['From'] = from_header
+
+        msg['To'] = message['to_email']
+        msg['Subject'] = message['subject']
+        return msg
+
+    @staticmethod
+    def _serialize_message(msg: MIMEText) -> bytes:
+        """Flatten a message the way smtplib.send_message puts it on the wire."""
+        with io.BytesIO() as out:
+            BytesGenerator(out).flatten(msg, linesep='\r\n')
+            return out.getvalue()
+
+    @staticmethod
+    def _send(smtp: smtplib.SMTP, from_addr: Optional[str], to_email: str,
+              msg) -> None:
+        """Send prebuilt bytes with sendmail, or a message with send_message."""
+        if isinstance(msg, bytes):
+            smtp.sendmail(from_addr, [to_email], msg)
+        else:
+            smtp.send_message(msg)
 
     def create_email_job(
         self,
@@ -198,7 +511,7 @@ class MailService:
                     body = template_content
 
             # Generate tracking ID for the job
-            tracking_id = str(uuid.uuid4())
+            tracking_id = uuid.uuid4().hex
 
             # Create job record
             job = EmailJob(
@@ -219,20 +532,23 @@ class MailService:
             db.session.add(job)
             db.session.flush()
 
-            # Create delivery records
-            deliveries = []
-            for recipient in recipients:
-                delivery = EmailDelivery(
-                    job_id=job.id,
-                    recipient=recipient['email'],
-                    variables=recipient.get(
-                        'variables', {}) if template_id else None,
-                    status='pending'
-                )
-                deliveries.append(delivery)
-
-            db.session.bulk_save_objects(deliveries)
+            # Create delivery records in one executemany; column defaults
+            # (timestamps) are still filled in per row
+            if recipients:
+                db.session.execute(insert(EmailDelivery), [
+                    {
+                        'job_id': job.id,
+                        'recipient': recipient['email'],
+                        'variables': recipient.get(
+                            'variables', {}) if template_id else None,
+                        'status': 'pending',
+                        'tracking_id': delivery_tracking_id
+                    }
+                    for recipient, delivery_tracking_id in zip(
+                        recipients, _tracking_ids(len(recipients)))
+                ])
             db.session.commit()
+            self.count_job_recipients(user_id, job.recipient_count)
 
             return job, None
 
@@ -240,29 +556,129 @@ class MailService:
             db.session.rollback()
             return None, f"Failed to create email job: {str(e)}"
 
+    @staticmethod
+    def claim_pending_deliveries(job_id: int, limit: int) -> List[EmailDelivery]:
+        """
+        Claim up to limit pending deliveries of a job for this worker.
+
+        Rows another worker is claiming are skipped instead of waited on,
+        and claimed rows move to 'sending' so they stay out of other
+        claims once the row locks are released. The claim stamps
+        last_attempt as its lease; rows whose lease has expired were
+        left behind by a dead worker and are claimed again.
+
+        Args:
+            job_id: ID of the email job
+            limit: Maximum number of deliveries to claim
+
+        Returns:
+            List[EmailDelivery]: The claimed deliveries, oldest first
+        """
+        claimable = select(EmailDelivery.id).where(
+            EmailDelivery.job_id == job_id,
+            EmailDelivery.claimable()
+        ).order_by(EmailDelivery.id).limit(limit).with_for_update(skip_locked=True)
+
+        claimed_ids = db.session.scalars(
+            update(EmailDelivery)
+            .where(EmailDelivery.id.in_(claimable))
+            .values(status=EmailDelivery.STATUS_SENDING,
+                    last_attempt=datetime.now(timezone.utc))
+            .returning(EmailDelivery.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+
+        if not claimed_ids:
+            return []
+        return EmailDelivery.query.filter(
+            EmailDelivery.id.in_(claimed_ids)
+        ).order_by(EmailDelivery.id).all()
+
+    @staticmethod
+    def count_claimable_deliveries(job_id: int) -> int:
+        """Count deliveries of a job that are pending or whose claim expired."""
+        return EmailDelivery.query.filter(
+            EmailDelivery.job_id == job_id,
+            EmailDelivery.claimable()
+        ).count()
+
+    @staticmethod
+    def release_claimed_deliveries(
+        delivery_ids: List[int],
+        status: str = EmailDelivery.STATUS_PENDING,
+        error_message: Optional[str] = None
+    ) -> None:
+        """Move claimed deliveries that were never sent to a new status and drop their lease."""
+        if not delivery_ids:
+            return
+
+        db.session.execute(
+            update(EmailDelivery)
+            .where(EmailDelivery.id.in_(delivery_ids),
+                   EmailDelivery.status == EmailDelivery.STATUS_SENDING)
+            .values(status=status, error_message=error_message,
+                    last_attempt=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def _get_job_recipients_key(user_id: int, day: date) -> str:
+        """Generate key for the recipients of a user's jobs created on a day."""
+        return f"sent:{user_id}:{day.isoformat()}"
+
+    @staticmethod
+    def _get_job_recipients_version_key(user_id: int, day: date) -> str:
+        """Generate key counting jobs created by a user on a day."""
+        return f"sent:{user_id}:{day.isoformat()}:version"
+
+    @staticmethod
+    def count_job_recipients(user_id: int, recipient_count: int) -> None:
+        """Add a new job's recipients to the user's cached daily total."""
+        today = datetime.now(timezone.utc).date()
+        try:
+            redis_client.eval(
+                _INCRBY_IF_EXISTS, 2,
+                MailService._get_job_recipients_key(user_id, today),
+                MailService._get_job_recipients_version_key(user_id, today),
+                recipient_count, MailService.JOB_RECIPIENTS_TTL)
+        except Exception as e:
+            logger.error(f"Error counting job recipients for user {user_id}: {str(e)}")
+
     def validate_sending_quota(
             self,
             user_id: int,
             recipient_count: int
     ) -> Tuple[bool, Optional[str]]:
         """Validate if user has enough quota to send emails."""
-        user = User.query.get(user_id)
-        if not user:
+        role = QuotaService.get_user_role(user_id)
+        if not role:
             return False, "User not found"
 
-        daily_limit = ROLE_CONFIGURATIONS[user.role]['limits'][
-            ResourceLimit.DAILY_EMAILS.value]
+        daily_limit = ROLE_DAILY_EMAIL_LIMITS[role]
         if daily_limit == -1:  # unlimited
             return True, None
 
         today_start = datetime.now(timezone.utc).replace(
             hour=0, minute=0, second=0, microsecond=0
         )
+        cache_key = self._get_job_recipients_key(user_id, today_start.date())
+        version_key = self._get_job_recipients_version_key(
+            user_id, today_start.date())
 
-        sent_today = EmailJob.query.filter(
-            EmailJob.user_id == user_id,
-            EmailJob.created_at >= today_start
-        ).with_entities(db.func.sum(EmailJob.recipient_count)).scalar() or 0
+        sent_today = version = None
+        try:
+            cached, version = redis_client.mget([cache_key, version_key])
+            if cached is not None:
+                sent_today = int(cached)
+        except Exception as e:
+            logger.error(f"Error reading daily total for user {user_id}: {str(e)}")
+
+        if sent_today is None:
+            sent_today = self._sum_job_recipients(user_id, today_start)
+            self._seed_job_recipients(cache_key, version_key, version,
+                                      sent_today)
 
         if sent_today + recipient_count > daily_limit:
             remaining = max(0, daily_limit - sent_today)
@@ -270,6 +686,40 @@ class MailService:
 
         return True, None
 
+    @staticmethod
+    def _sum_job_recipients(user_id: int, since: datetime) -> int:
+        """Total recipients of a user's jobs created since a time."""
+        return EmailJob.query.filter(
+            EmailJob.user_id == user_id,
+            EmailJob.created_at >= since
+        ).with_entities(db.func.sum(EmailJob.recipient_count)).scalar() or 0
+
+    @staticmethod
+    def _seed_job_recipients(cache_key: str, version_key: str, version,
+                             total: int) -> None:
+        """
+        Cache a daily total read from the database.
+
+        Skipped if a job was counted since version was read: that job may
+        have committed after the total was summed, and its count found no
+        key to add to.
+        """
+        try:
+            with redis_client.pipeline() as pipe:
+                pipe.watch(version_key)
+                if pipe.get(version_key) != version:
+                    return
+                pipe.multi()
+                # NX so a total already bumped by a new job is kept
+                pipe.set(cache_key, total, nx=True,
+                         ex=MailService.JOB_RECIPIENTS_TTL)
+                pipe.execute()
+        except WatchError:
+            # A job was counted meanwhile; the next check sums again
+            pass
+        except Exception as e:
+            logger.error(f"Error caching daily total {cache_key}: {str(e)}")
+
     def _handle_email_error(
         self,
         error: Exception,
@@ -284,9 +734,12 @@ class MailService:
             error_msg = f"SMTP error occurred: {str(error)}"
         elif isinstance(error, sqlalchemy.exc.SQLAlchemyError):
             db.session.rollback()
-            if smtp_config:
+            # Identity avoids reloading the config the rollback just expired;
+            # transient system configs have none
+            identity = sqlalchemy.inspect(smtp_config).identity if smtp_config else None
+            if identity:
                 try:
-                    smtp_config.failure_count += 1
+                    SMTPConfiguration.record_failure(identity[0])
                     db.session.commit()
                 except:
                     db.session.rollback()
@@ -303,13 +756,44 @@ class MailService:
     def send_test_email(
         smtp_config: SMTPConfiguration
     ) -> Tuple[bool, Optional[str]]:
-        """Send a test email using specific SMTP configuration."""
-        service = MailService()
-
-        return service.send_raw_email(
-            user_id=smtp_config.user_id,
-            to_email=smtp_config.from_email,
-            subject="MailSage SMTP Test",
-            body="Your SMTP configuration is working correctly!",
-            smtp_config=smtp_config
-        )
+        """Send a test email using specific SMTP configuration.
+
+        Test emails don't count toward the daily limit, so they skip the
+        send accounting and go out on a connection of their own.
+        """
+        try:
+            MailService._send_plain(
+                smtp_config,
+                to_email=smtp_config.from_email,
+                subject="MailSage SMTP Test",
+                body="Your SMTP configuration is working correctly!"
+            )
+        except Exception as e:
+            return False, MailService()._handle_email_error(e, smtp_config)
+        return True, None
+
+    @staticmethod
+    def _send_plain(
+        smtp_config: SMTPConfiguration,
+        to_email: str,
+        subject: str,
+        body: str
+    ) -> None:
+        """Send a plain text message without touching the database."""
+        password = decrypt_value_cached(smtp_config.password)
+        if not password:
+            raise ValueError("Invalid SMTP password")
+
+        msg = MIMEText(body)
+        msg['From'] = smtp_config.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        smtp = SMTPConnectionPool._connect(smtp_config, password)
+        try:
+            smtp.send_message(msg)
+        finally:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
@@ -1,3 +1,4 @@
+from sqlalchemy import case, func
 from sqlalchemy.exc import SQLAlchemyError
 from app.extensions import db
 from app.models.email import EmailJob, EmailDelivery
@@ -18,15 +19,11 @@ class MetricsService:
             if total_sent > 0:
                 job.delivery_rate = (job.success_count / total_sent) * 100
 
-            opens = EmailDelivery.query.filter(
-                EmailDelivery.job_id == job_id,
-                EmailDelivery.opened_at.isnot(None)
-            ).count()
-
-            clicks = EmailDelivery.query.filter(
-                EmailDelivery.job_id == job_id,
-                EmailDelivery.clicked_at.isnot(None)
-            ).count()
+            # Opens and clicks in a single pass over the job's deliveries
+            opens, clicks = db.session.query(
+                func.count(case((EmailDelivery.opened_at.isnot(None), 1))),
+                func.count(case((EmailDelivery.clicked_at.isnot(None), 1)))
+            ).filter(EmailDelivery.job_id == job_id).one()
 
             if job.success_count > 0:
                 job.open_rate = (opens / job.success_count) * 100
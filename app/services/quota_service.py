@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from typing import Tuple
+from typing import Optional, Tuple
 from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 from app.extensions import db, redis_client
@@ -7,16 +7,63 @@ from app.models import User, Template, ApiKey
 from app.utils.logging import logger
 from app.utils.roles import ROLE_CONFIGURATIONS, ResourceLimit
 
+# Count a hit and start the window's expiry on the first one, atomically
+_RATE_LIMIT_SCRIPT = (
+    "local count = redis.call('INCR', KEYS[1]) "
+    "if count == 1 then redis.call('EXPIRE', KEYS[1], ARGV[1]) end "
+    "return count"
+)
+
 
 class QuotaService:
+    ROLE_CACHE_TTL = 60  # seconds
+    RATE_LIMIT_WINDOW = 3600  # seconds
+
+    # Registered on first use; redis_client is bound by init_app
+    _rate_limit_script = None
+
+    @staticmethod
+    def _get_role_cache_key(user_id: int) -> str:
+        """Generate cache key for a user's role."""
+        return f"user:{user_id}:role"
+
+    @staticmethod
+    def get_user_role(user_id: int) -> Optional[str]:
+        """Get a user's role, cached briefly so bulk sends skip the user row."""
+        cache_key = QuotaService._get_role_cache_key(user_id)
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                return cached.decode() if isinstance(cached, bytes) else cached
+        except Exception as e:
+            logger.error(f"Error reading cached role for user {user_id}: {str(e)}")
+
+        role = db.session.query(User.role).filter(User.id == user_id).scalar()
+        if role:
+            try:
+                redis_client.setex(cache_key, QuotaService.ROLE_CACHE_TTL, role)
+            except Exception as e:
+                logger.error(f"Error caching role for user {user_id}: {str(e)}")
+        return role
+
+    @staticmethod
+    def invalidate_user_role(user_id: int) -> None:
+        """Drop a cached user role."""
+        try:
+            redis_client.delete(QuotaService._get_role_cache_key(user_id))
+        except Exception as e:
+            logger.error(f"Error invalidating role for user {user_id}: {str(e)}")
+
     @staticmethod
     def check_rate_limit(user_id: int, rate_limit: int) -> Tuple[bool, int]:
         """Check if user has exceeded rate limit using Redis."""
         key = f"rate_limit:{user_id}:{datetime.now(timezone.utc)
                                       .strftime('%Y-%m-%d-%H')}"
-        count = redis_client.incr(key)
-        if count == 1:
-            redis_client.expire(key, 3600)  # Expire after 1 hour
+        if QuotaService._rate_limit_script is None:
+            QuotaService._rate_limit_script = redis_client.register_script(
+                _RATE_LIMIT_SCRIPT)
+        count = QuotaService._rate_limit_script(
+            keys=[key], args=[QuotaService.RATE_LIMIT_WINDOW])
         return count <= rate_limit, rate_limit - count
 
     @staticmethod
@@ -39,11 +86,11 @@ class QuotaService:
 
     @staticmethod
     def check_resource_limit(user_id: int, resource_type: str) -> bool:
-        user = User.query.get(user_id)
-        if not user:
+        role = QuotaService.get_user_role(user_id)
+        if not role:
             return False
 
-        limit = ROLE_CONFIGURATIONS[user.role]['limits'][resource_type]
+        limit = ROLE_CONFIGURATIONS[role]['limits'][resource_type]
         if limit == -1:  # unlimited
             return True
 
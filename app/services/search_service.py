@@ -1,37 +1,76 @@
-from sqlalchemy import or_
+import re
+from functools import lru_cache
+from sqlalchemy import select, tuple_
 from app.models import Template
-from typing import List
+from typing import List, Optional, Tuple
 from sqlalchemy.sql.expression import cast
-from sqlalchemy import String
+from sqlalchemy import REAL
 from sqlalchemy.sql import func
-from flask import current_app
+
+_RE_SEARCH_TERM = re.compile(r'\w+')
 
 
 class TemplateSearchService:
     @staticmethod
-    def search_templates(query: str, user_id: int) -> List[Template]:
+    @lru_cache(maxsize=1024)
+    def _clean_query(query: str) -> str:
+        """Turn free text into an AND of its words in to_tsquery syntax."""
+        return ' & '.join(_RE_SEARCH_TERM.findall(query))
+
+    @staticmethod
+    def _tsquery(query: str):
+        """Single-row CTE holding the parsed tsquery, joined on the match."""
+        return select(func.to_tsquery(
+            'english', TemplateSearchService._clean_query(query)
+        ).label('q')).cte('q')
+
+    @staticmethod
+    def search_templates(query: str, user_id: int, limit: Optional[int] = None,
+                         after: Optional[Tuple[float, int]] = None
+                         ) -> List[Template]:
         """
         Search templates using full-text search with search vectors.
 
+        Results are ordered by cover density rank, then id, and each
+        template carries its rank on search_rank so pages can be fetched
+        by seeking past the last one instead of offsetting.
+
         Args:
             query: Search query string
             user_id: User ID to filter templates
+            limit: Maximum number of templates to return
+            after: (search_rank, id) of the last template of the previous page
 
         Returns:
             List of matching Template objects
         """
-        # Clean and prepare the search query
-        cleaned_query = ' & '.join(query.split())
+        # Parse the search query once for both filtering and ranking
+        tsquery = TemplateSearchService._tsquery(query)
+        rank = func.ts_rank_cd(Template.search_vector, tsquery.c.q)
 
-        return Template.query.filter(
+        search = Template.query.join(
+            tsquery, Template.search_vector.op('@@')(tsquery.c.q)
+        ).filter(
             Template.user_id == user_id,
             Template.is_active == True,
-            Template.deleted_at == None,
-            Template.search_vector.match(cleaned_query)
-        ).order_by(
-            func.ts_rank(Template.search_vector, func.to_tsquery(
-                'english', cleaned_query)).desc()
-        ).all()
+            Template.deleted_at == None
+        ).add_columns(rank)
+
+        if after is not None:
+            # ts_rank_cd is a real; compare at that precision so ties seek
+            after_rank, after_id = after
+            search = search.filter(
+                tuple_(rank, Template.id) < tuple_(cast(after_rank, REAL), after_id))
+
+        search = search.order_by(rank.desc(), Template.id.desc())
+        if limit is not None:
+            search = search.limit(limit)
+
+        templates = []
+        for template, template_rank in search:
+            template.search_rank = template_rank
+            templates.append(template)
+        return templates
 
     @staticmethod
     def search_templates_by_tag(tag: str, user_id: int) -> List[Template]:
@@ -65,9 +104,6 @@ class TemplateSearchService:
         Returns:
             List of matching Template objects
         """
-        # Clean and prepare the search query
-        cleaned_query = ' & '.join(query.split())
-
         base_query = Template.query.filter(
             Template.user_id == user_id,
             Template.is_active == True,
@@ -75,8 +111,10 @@ class TemplateSearchService:
         )
 
         if query:
-            base_query = base_query.filter(
-                Template.search_vector.match(cleaned_query)
+            # Parse the search query once for both filtering and ranking
+            tsquery = TemplateSearchService._tsquery(query)
+            base_query = base_query.join(
+                tsquery, Template.search_vector.op('@@')(tsquery.c.q)
             )
 
         if tags:
@@ -85,44 +123,6 @@ class TemplateSearchService:
             )
 
         return base_query.order_by(
-            func.ts_rank(Template.search_vector, func.to_tsquery(
-                'english', cleaned_query)).desc()
+            func.ts_rank_cd(Template.search_vector, tsquery.c.q).desc()
             if query else Template.updated_at.desc()
         ).all()
-
-    @staticmethod
-    def update_search_vector(template: Template) -> None:
-        """
-        Update the search vector for a template.
-
-        Args:
-            template: Template instance to update search vector for
-        """
-        try:
-            # Combine all searchable fields with weights
-            # A: name (highest weight)
-            # B: description
-            # C: html_content (lowest weight)
-            # This ensures name matches appear first in search results
-            search_vector = func.setweight(
-                func.to_tsvector('english', template.name or ''), 'A')
-
-            if template.description:
-                search_vector = search_vector.op('||')(
-                    func.setweight(func.to_tsvector(
-                        'english', template.description), 'B')
-                )
-
-            if template.html_content:
-                search_vector = search_vector.op('||')(
-                    func.setweight(func.to_tsvector(
-                        'english', template.html_content), 'C')
-                )
-
-            # Update the template's search vector
-            template.search_vector = search_vector
-
-        except Exception as e:
-            current_app.logger.error(f"Error updating search vector: {str(e)}")
-            # Don't raise the error, as this is a non-critical operation
-            pass
@@ -0,0 +1,275 @@
+import smtplib
+import socket
+import ssl
+import threading
+import time
+from collections import defaultdict, deque
+from app.models import SMTPConfiguration
+from app.utils import dns_cache
+from app.utils.logging import logger
+
+# Shared by every STARTTLS handshake instead of one context per connection.
+# Same settings as smtplib's own default, which doesn't verify the server
+SMTP_SSL_CONTEXT = ssl.create_default_context()
+SMTP_SSL_CONTEXT.check_hostname = False
+SMTP_SSL_CONTEXT.verify_mode = ssl.CERT_NONE
+
+
+class CachedDNSSMTP(smtplib.SMTP):
+    """smtplib.SMTP that resolves the server through the DNS cache.
+
+    Only the socket is opened on the cached address; the hostname is kept
+    for STARTTLS server name indication.
+    """
+
+    def _get_socket(self, host, port, timeout):
+        # smtplib only keeps the name for STARTTLS when the constructor
+        # connects, not on a later connect()
+        self._host = host
+        # Try each address in turn, as socket.create_connection would
+        error = None
+        for ip in dns_cache.resolve(host, port):
+            try:
+                sock = super()._get_socket(ip, port, timeout)
+                break
+            except OSError as e:
+                error = e
+        else:
+            # The cached addresses may be stale; resolve afresh next time
+            dns_cache.invalidate(host)
+            raise error
+        # Commands are small and each waits for a reply; don't let Nagle
+        # hold one back waiting for an ACK
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+
+class PipelinedSMTP(CachedDNSSMTP):
+    """CachedDNSSMTP that pipelines the envelope when the server allows it.
+
+    With PIPELINING (RFC 2920) advertised, sendmail writes MAIL, RCPT and
+    DATA together and then reads their replies in order, saving two round
+    trips per message. Results and errors are those of smtplib's sendmail.
+    """
+
+    _batch = None
+
+    def send(self, s):
+        # Collect commands while a pipelined group is being written
+        if self._batch is not None:
+            self._batch.append(s)
+        else:
+            super().send(s)
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(),
+                 rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn('pipelining'):
+            return super().sendmail(
+                from_addr, to_addrs, msg, mail_options, rcpt_options)
+
+        if isinstance(msg, str):
+            msg = smtplib._fix_eols(msg).encode('ascii')
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        esmtp_opts = list(mail_options)
+        if self.has_extn('size'):
+            esmtp_opts.insert(0, "size=%d" % len(msg))
+        if any(x.lower() == 'smtputf8' for x in esmtp_opts):
+            if not self.has_extn('smtputf8'):
+                raise smtplib.SMTPNotSupportedError(
+                    'SMTPUTF8 not supported by server')
+            self.command_encoding = 'utf-8'
+        mail_list = ' ' + ' '.join(esmtp_opts) if esmtp_opts else ''
+        rcpt_list = ' ' + ' '.join(rcpt_options) if rcpt_options else ''
+
+        # Queue the envelope and write it at once
+        self._batch = []
+        try:
+            self.putcmd("mail", "FROM:%s%s" % (
+                smtplib.quoteaddr(from_addr), mail_list))
+            for each in to_addrs:
+                self.putcmd("rcpt", "TO:%s%s" % (
+                    smtplib.quoteaddr(each), rcpt_list))
+            self.putcmd("data")
+            batch = self._batch
+        finally:
+            self._batch = None
+        self.send(''.join(batch))
+
+        # Replies come back in command order
+        (code, resp) = self.getreply()
+        if code == 421:
+            self.close()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        senderrs = {}
+        for each in to_addrs:
+            (rcpt_code, rcpt_resp) = self.getreply()
+            if rcpt_code not in (250, 251):
+                senderrs[each] = (rcpt_code, rcpt_resp)
+            if rcpt_code == 421:
+                self.close()
+                raise smtplib.SMTPRecipientsRefused(senderrs)
+        (data_code, data_resp) = self.getreply()
+
+        if code != 250 or len(senderrs) == len(to_addrs):
+            # A server may still have accepted DATA; end it empty
+            if data_code == 354:
+                self.send(b"." + smtplib.bCRLF)
+                self.getreply()
+            self._rset()
+            if code != 250:
+                raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+            raise smtplib.SMTPRecipientsRefused(senderrs)
+        if data_code != 354:
+            if data_code == 421:
+                self.close()
+            else:
+                self._rset()
+            raise smtplib.SMTPDataError(data_code, data_resp)
+
+        q = smtplib._quote_periods(msg)
+        if q[-2:] != smtplib.bCRLF:
+            q = q + smtplib.bCRLF
+        self.send(q + b"." + smtplib.bCRLF)
+        code, resp = self.getreply()
+        if code != 250:
+            if code == 421:
+                self.close()
+            else:
+                self._rset()
+            raise smtplib.SMTPDataError(code, resp)
+        return senderrs
+
+
+class _PooledSMTP:
+    """An authenticated SMTP session checked out of the pool."""
+
+    __slots__ = ('key', 'smtp', 'sent', 'last_used')
+
+    def __init__(self, key: tuple, smtp: smtplib.SMTP):
+        self.key = key
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP sessions alive between sends.
+
+    Sessions are keyed by server and login, checked with NOOP before reuse
+    and retired after MAX_MESSAGES sends or IDLE_TIMEOUT seconds unused.
+    """
+
+    # Providers commonly cap messages per connection around 100
+    MAX_MESSAGES = 100
+    # Retire sessions before the usual 120s server idle timeout drops them
+    IDLE_TIMEOUT = 90
+    # Concurrent sessions per server and login, to respect provider limits
+    MAX_CONNECTIONS = 5
+    ACQUIRE_TIMEOUT = 30
+
+    def __init__(self):
+        self._idle = defaultdict(deque)
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(smtp_config: SMTPConfiguration) -> tuple:
+        return (smtp_config.host, smtp_config.port,
+                smtp_config.username, bool(smtp_config.use_tls))
+
+    def _slot(self, key: tuple) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = threading.BoundedSemaphore(
+                    self.MAX_CONNECTIONS)
+            return slot
+
+    def acquire(self, smtp_config: SMTPConfiguration, password: str) -> _PooledSMTP:
+        """Check out a live session, connecting only if none can be reused."""
+        key = self._key(smtp_config)
+        slot = self._slot(key)
+        if not slot.acquire(timeout=self.ACQUIRE_TIMEOUT):
+            raise smtplib.SMTPConnectError(
+                421, "Too many concurrent connections to SMTP server")
+
+        try:
+            while True:
+                with self._lock:
+                    idle = self._idle[key]
+                    conn = idle.pop() if idle else None
+                if conn is None:
+                    break
+                if time.monotonic() - conn.last_used > self.IDLE_TIMEOUT:
+                    self._close(conn)
+                    continue
+                try:
+                    if conn.smtp.noop()[0] == 250:
+                        return conn
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._close(conn)
+
+            return _PooledSMTP(key, self._connect(smtp_config, password))
+        except Exception:
+            slot.release()
+            raise
+
+    def release(self, conn: _PooledSMTP, healthy: bool = True) -> None:
+        """Return a session to the pool, or close it if it is spent or broken."""
+        try:
+            if healthy and conn.sent < self.MAX_MESSAGES:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle[conn.key].append(conn)
+            else:
+                self._close(conn)
+        finally:
+            self._slot(conn.key).release()
+
+    def adopt(self, smtp_config: SMTPConfiguration, smtp: smtplib.SMTP) -> None:
+        """Pool a session authenticated elsewhere, or close it if enough are idle."""
+        conn = _PooledSMTP(self._key(smtp_config), smtp)
+        with self._lock:
+            idle = self._idle[conn.key]
+            if len(idle) < self.MAX_CONNECTIONS:
+                idle.append(conn)
+                return
+        self._close(conn)
+
+    @staticmethod
+    def _connect(smtp_config: SMTPConfiguration, password: str) -> smtplib.SMTP:
+        """Connect, start TLS and log in to the SMTP server."""
+        logger.info("Establishing SMTP connection...")
+        smtp = PipelinedSMTP(
+            smtp_config.host,
+            smtp_config.port,
+            timeout=30
+        )
+        try:
+            if smtp_config.use_tls:
+                logger.debug("Starting TLS...")
+                smtp.starttls(context=SMTP_SSL_CONTEXT)
+
+            logger.debug("Attempting SMTP login...")
+            smtp.login(
+                smtp_config.username,
+                password
+            )
+        except Exception:
+            smtp.close()
+            raise
+
+        return smtp
+
+    @staticmethod
+    def _close(conn: _PooledSMTP) -> None:
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.smtp.close()
+
+
+smtp_pool = SMTPConnectionPool()
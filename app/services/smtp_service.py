@@ -1,18 +1,127 @@
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import smtplib
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from ssl import SSLError
 from flask import current_app
-from app.utils.encryption import encrypt_value, decrypt_value
-from app.extensions import db
+from app.utils.encryption import encrypt_value, decrypt_value_cached
+from app.extensions import db, redis_client
 from app.models import SMTPConfiguration, User
+from sqlalchemy import case, func, or_, select, update
 import socket
 import ssl
-from app.utils.roles import ROLE_CONFIGURATIONS, ResourceLimit
+from app.utils.roles import ROLE_DAILY_EMAIL_LIMITS
+from app.services.smtp_pool import SMTP_SSL_CONTEXT, CachedDNSSMTP, smtp_pool
+
+_REQUIRED_FIELDS = ('host', 'port', 'username', 'password')
+# Fields update_config sets as given; the password is encrypted first
+_UPDATABLE_FIELDS = frozenset({
+    'name', 'host', 'port', 'username', 'use_tls', 'from_email',
+    'is_default', 'daily_limit'
+})
+
 
 class SMTPService:
     """Service for managing SMTP configurations and connections."""
 
+    DEFAULT_CONFIG_CACHE_TTL = 60  # seconds
+    SENT_COUNTER_TTL = 48 * 3600  # seconds; outlives the day it counts
+    USAGE_LAST_USED_KEY = "smtp:usage:last_used"
+
+    @staticmethod
+    def get_default_config_cache_key(user_id: int) -> str:
+        """Generate cache key for a user's default SMTP configuration id."""
+        return f"user:{user_id}:smtp_config"
+
+    @staticmethod
+    def invalidate_default_config(user_id: int) -> None:
+        """Drop the cached default SMTP configuration of a user."""
+        try:
+            redis_client.delete(SMTPService.get_default_config_cache_key(user_id))
+        except Exception as e:
+            current_app.logger.error(
+                f"Error invalidating SMTP config cache for user {user_id}: {str(e)}")
+
+    @staticmethod
+    def get_sent_counter_key(config_id: int, day: date) -> str:
+        """Generate key for the number of emails a config sent on a day."""
+        return f"smtp:sent:{config_id}:{day.isoformat()}"
+
+    @staticmethod
+    def flush_send_counters() -> Tuple[int, Optional[str]]:
+        """Write daily send counters kept in Redis to smtp_configurations."""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hgetall(SMTPService.USAGE_LAST_USED_KEY)
+            pipe.delete(SMTPService.USAGE_LAST_USED_KEY)
+            last_used, _ = pipe.execute()
+        except Exception as e:
+            current_app.logger.error(
+                f"Error reading SMTP send counters: {str(e)}")
+            return 0, str(e)
+
+        if not last_used:
+            return 0, None
+
+        rows = []
+        for config_id, ts in last_used.items():
+            used = datetime.fromtimestamp(float(ts), timezone.utc)
+            rows.append({'id': int(config_id), 'used': used})
+
+        table = SMTPConfiguration.__table__
+        try:
+            counts = redis_client.mget([
+                SMTPService.get_sent_counter_key(row['id'], row['used'].date())
+                for row in rows
+            ])
+            for row, count in zip(rows, counts):
+                day_start = row['used'].replace(
+                    hour=0, minute=0, second=0, microsecond=0)
+                values = {
+                    'last_used_at': func.greatest(
+                        func.coalesce(table.c.last_used_at, row['used']),
+                        row['used'])
+                }
+                # A missing counter expired and only the last-used time is
+                # written. Within the same day the row may also hold slots
+                # claimed by the database fallback while Redis was down, so
+                # keep whichever count is higher.
+                if count is not None:
+                    values.update(
+                        emails_sent_today=case(
+                            (table.c.last_reset_date >= day_start,
+                             func.greatest(
+                                 func.coalesce(table.c.emails_sent_today, 0),
+                                 int(count))),
+                            else_=int(count)),
+                        last_reset_date=day_start)
+                # Skip rows already counting a later day
+                db.session.execute(
+                    update(table).where(
+                        table.c.id == row['id'],
+                        or_(table.c.last_reset_date.is_(None),
+                            table.c.last_reset_date
+                            < day_start + timedelta(days=1))
+                    ).values(**values)
+                )
+            db.session.commit()
+            return len(rows), None
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Error flushing SMTP send counters: {str(e)}")
+            # Put the configs back so the next flush can retry them
+            try:
+                pipe = redis_client.pipeline()
+                for row in rows:
+                    pipe.hset(SMTPService.USAGE_LAST_USED_KEY, row['id'],
+                              row['used'].timestamp())
+                pipe.execute()
+            except Exception as redis_error:
+                current_app.logger.error(
+                    f"Error restoring SMTP send counters: {str(redis_error)}")
+            return 0, str(e)
+
     @staticmethod
     def validate_smtp_config(config: Dict) -> Tuple[bool, Optional[str]]:
         """
@@ -26,23 +135,21 @@ class SMTPService:
             Tuple of (success: bool, error_message: Optional[str])
         """
 
-        require_fields = ['host', 'port', 'username', 'password']
-        if not all(field in config for field in require_fields):
+        if not all(field in config for field in _REQUIRED_FIELDS):
             return False, "Missing required SMTP configuration fields"
 
         try:
             current_app.logger.info(f"Testing SMTP connection to {config['host']}:{
                                     config['port']} with username: {config['username']}")
 
-            # First try to resolve the hostname
-            try:
-                with smtplib.SMTP(timeout=5) as smtp:
+            with CachedDNSSMTP(timeout=10) as smtp:
+                # First try to resolve the hostname, then authenticate on
+                # the same connection
+                try:
                     smtp.connect(config['host'], int(config['port']))
-            except (ConnectionRefusedError, socket.gaierror) as e:
-                return False, f"Could not connect to SMTP server: {str(e)}"
+                except (ConnectionRefusedError, socket.gaierror, socket.timeout) as e:
+                    return False, f"Could not connect to SMTP server: {str(e)}"
 
-            # Now try full connection with authentication
-            with smtplib.SMTP(config['host'], int(config['port']), timeout=10) as smtp:
                 # Get server info
                 server_info = smtp.ehlo()
                 if not server_info[0] in [250, 220, 200]:
@@ -53,7 +160,7 @@ class SMTPService:
                     if not smtp.has_extn('STARTTLS'):
                         return False, "Server does not support TLS but TLS is required"
                     try:
-                        smtp.starttls()
+                        smtp.starttls(context=SMTP_SSL_CONTEXT)
                         # After TLS, need to EHLO again
                         smtp.ehlo()
                     except ssl.SSLError as e:
@@ -68,7 +175,12 @@ class SMTPService:
                 # Check if we can send from the specified email
                 if 'from_email' in config:
                     try:
-                        smtp.verify(config['from_email'])
+                        code, resp = SMTPService.probe_recipients(
+                            smtp, config['from_email'], [config['from_email']]
+                        )[config['from_email']]
+                        if code not in (250, 251):
+                            current_app.logger.warning(
+                                f"From email verification warning: {code} {resp}")
                     except smtplib.SMTPException as e:
                         current_app.logger.warning(
                             f"From email verification warning: {str(e)}")
@@ -107,19 +219,20 @@ class SMTPService:
             Tuple of (success: bool, error_message: Optional[str])
         """
         try:
-            user = User.query.get(user_id)
+            user = db.session.get(User, user_id)
             if not user:
                 return None, "User not found"
 
             # If this is set as default, unset any existing default
             if config_data.get('is_default'):
-                SMTPConfiguration.query.filter_by(
-                    user_id=user_id,
-                    is_default=True
-                ).update({'is_default': False})
+                db.session.execute(
+                    update(SMTPConfiguration).where(
+                        SMTPConfiguration.user_id == user_id,
+                        SMTPConfiguration.is_default.is_(True)
+                    ).values(is_default=False)
+                )
 
-            daily_limit = ROLE_CONFIGURATIONS[user.role]['limits'][
-                ResourceLimit.DAILY_EMAILS.value]
+            daily_limit = ROLE_DAILY_EMAIL_LIMITS[user.role]
 
             # Encrypt sensitive fields
             config = SMTPConfiguration(
@@ -136,9 +249,10 @@ class SMTPService:
             )
 
             db.session.add(config)
+            # Assign the id the notification refers to
+            db.session.flush()
 
-            # Add notification before creation
-            user = User.query.get(config.user_id)
+            # Committed together with the config
             user.add_notification(
                 title="SMTP Configuration Created",
                 message=f"SMTP configuration {config.name} has been created",
@@ -146,7 +260,7 @@ class SMTPService:
                 category="smtp",
                 meta_data={"config_id": config.id}
             )
-            db.session.commit()
+            SMTPService.invalidate_default_config(user_id)
 
             return config, None
 
@@ -171,23 +285,21 @@ class SMTPService:
         """
         try:
             if updates.get('is_default') and not config.is_default:
-                SMTPConfiguration.query.filter_by(
-                    user_id=config.user_id,
-                    is_default=True
-                ).update({'is_default': False})
+                db.session.execute(
+                    update(SMTPConfiguration).where(
+                        SMTPConfiguration.user_id == config.user_id,
+                        SMTPConfiguration.is_default.is_(True)
+                    ).values(is_default=False)
+                )
 
             for key, value in updates.items():
                 if key == 'password':
                     setattr(config, key, encrypt_value(value))
-                elif key in ['name', 'host', 'port', 'username',
-                             'use_tls', 'from_email', 'is_default',
-                             'daily_limit']:
+                elif key in _UPDATABLE_FIELDS:
                     setattr(config, key, value)
 
-            db.session.commit()
-
-            # Add notification before deletion
-            user = User.query.get(config.user_id)
+            # Committed together with the updates
+            user = db.session.get(User, config.user_id)
             user.add_notification(
                 title="SMTP Configuration Updated",
                 message=f"SMTP configuration {config.name} has been updated",
@@ -195,6 +307,7 @@ class SMTPService:
                 category="smtp",
                 meta_data={"config_id": config.id}
             )
+            SMTPService.invalidate_default_config(config.user_id)
             return True, None
 
         except Exception as e:
@@ -218,19 +331,24 @@ class SMTPService:
             config.is_active = False
 
             if config.is_default:
-                # Find another config to make default
-                new_default = SMTPConfiguration.query.filter_by(
-                    user_id=config.user_id,
-                    is_active=True
-                ).first()
+                # Find another config to make default, preferring the most
+                # recently tested so the new default is likely healthy
+                new_default = db.session.execute(
+                    select(SMTPConfiguration).where(
+                        SMTPConfiguration.user_id == config.user_id,
+                        SMTPConfiguration.is_active.is_(True),
+                        SMTPConfiguration.id != config.id
+                    ).order_by(
+                        SMTPConfiguration.last_test_at.desc().nullslast(),
+                        SMTPConfiguration.id.desc()
+                    ).limit(1)
+                ).scalar_one_or_none()
 
                 if new_default:
                     new_default.is_default = True
 
-            db.session.commit()
-
-            # Add notification before deletion
-            user = User.query.get(config.user_id)
+            # Committed together with the deactivation
+            user = db.session.get(User, config.user_id)
             user.add_notification(
                 title="SMTP Configuration Deleted",
                 message=f"SMTP configuration {config.name} has been deleted",
@@ -238,13 +356,46 @@ class SMTPService:
                 category="smtp",
                 meta_data={"config_id": config.id}
             )
+            SMTPService.invalidate_default_config(config.user_id)
 
             return True, None
 
         except Exception as e:
+            db.session.rollback()
             current_app.logger.error(f"Error deleting SMTP config: {str(e)}")
             return False, f"Failed to delete SMTP configuration: {str(e)}"
 
+    @staticmethod
+    def probe_recipients(smtp: smtplib.SMTP, from_addr: str,
+                         recipients: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Check which recipients a server would accept mail for, without sending.
+
+        Opens an envelope with MAIL FROM, records the reply to a RCPT TO for
+        each recipient and discards the envelope with RSET, so one session
+        can probe many addresses. Unlike VRFY, which most servers disable,
+        this is the check a real send goes through.
+
+        Args:
+            smtp: Connected, authenticated SMTP session
+            from_addr: Envelope sender
+            recipients: Addresses to check
+
+        Returns:
+            Dict mapping each recipient to the server's (code, message)
+
+        Raises:
+            smtplib.SMTPSenderRefused: If the server refuses the sender
+        """
+        code, resp = smtp.mail(from_addr)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        try:
+            return {recipient: smtp.rcpt(recipient) for recipient in recipients}
+        finally:
+            smtp.rset()
+
     @staticmethod
     def test_connection(config: SMTPConfiguration) -> Tuple[bool, Optional[str]]:
         """Test SMTP configuration by performing comprehensive connection tests."""
@@ -252,23 +403,34 @@ class SMTPService:
             current_app.logger.info(
                 f"Starting comprehensive SMTP test for {config.name}")
 
-            # Check and reset daily counter if needed
+            # Check and reset daily counter if needed. The reset is one
+            # conditional UPDATE, so a send counted since the config was
+            # loaded isn't overwritten with a stale zero
             if config.needs_daily_reset():
                 current_app.logger.info("Resetting daily email counter")
-                config.emails_sent_today = 0
-                config.last_reset_date = datetime.now(timezone.utc).date()
+                table = SMTPConfiguration.__table__
+                today = datetime.now(timezone.utc).replace(
+                    hour=0, minute=0, second=0, microsecond=0)
+                db.session.execute(
+                    update(table).where(
+                        table.c.id == config.id,
+                        or_(table.c.last_reset_date.is_(None),
+                            table.c.last_reset_date < today)
+                    ).values(emails_sent_today=0, last_reset_date=today)
+                )
                 db.session.commit()
 
-            # Step 1: Basic Connection Test
+            # Step 1: Basic Connection Test. The rest of the test runs on
+            # the same connection, which then serves the config's next send
             current_app.logger.info("Step 1: Testing basic connection...")
-            with smtplib.SMTP(timeout=5) as smtp:
+            smtp = CachedDNSSMTP(timeout=10)
+            try:
                 connect_response = smtp.connect(config.host, config.port)
                 if not connect_response[0] in [220, 250]:
                     return False, f"Connection failed: Server response {connect_response}"
 
-            # Step 2: Full Connection with Authentication
-            current_app.logger.info("Step 2: Testing authentication...")
-            with smtplib.SMTP(config.host, config.port, timeout=10) as smtp:
+                # Step 2: Full Connection with Authentication
+                current_app.logger.info("Step 2: Testing authentication...")
                 # Get server info and capabilities
                 server_info = smtp.ehlo()
                 if not server_info[0] in [250, 220]:
@@ -284,14 +446,14 @@ class SMTPService:
                         return False, "Server does not support STARTTLS"
 
                     current_app.logger.info("Initiating TLS connection...")
-                    smtp.starttls()
+                    smtp.starttls(context=SMTP_SSL_CONTEXT)
                     # Need to EHLO again after STARTTLS
                     smtp.ehlo()
 
                 # Test authentication
                 current_app.logger.info("Testing authentication...")
                 try:
-                    smtp.login(config.username, decrypt_value(config.password))
+                    smtp.login(config.username, decrypt_value_cached(config.password))
                 except smtplib.SMTPAuthenticationError as e:
                     return False, f"Authentication failed: {str(e)}"
 
@@ -300,7 +462,12 @@ class SMTPService:
                     current_app.logger.info(
                         f"Verifying from_email: {config.from_email}")
                     try:
-                        smtp.verify(config.from_email)
+                        code, resp = SMTPService.probe_recipients(
+                            smtp, config.from_email, [config.from_email]
+                        )[config.from_email]
+                        if code not in (250, 251):
+                            current_app.logger.warning(
+                                f"From email verification warning: {code} {resp}")
                     except smtplib.SMTPException as e:
                         current_app.logger.warning(
                             f"From email verification warning: {str(e)}")
@@ -311,13 +478,18 @@ class SMTPService:
                     current_app.logger.info(
                         f"Server message size limit: {size_limit}")
 
+                smtp_pool.adopt(config, smtp)
+                smtp = None
+            finally:
+                if smtp is not None:
+                    smtp.close()
+
             # Update test timestamp
             config.last_test_at = datetime.now(timezone.utc)
             config.failure_count = 0  # Reset failure count after successful test
-            db.session.commit()
 
-            # Add success notification
-            user = User.query.get(config.user_id)
+            # Add success notification, committed with the test results
+            user = db.session.get(User, config.user_id)
             user.add_notification(
                 title="SMTP Configuration Tested",
                 message=f"SMTP configuration {
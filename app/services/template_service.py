@@ -1,8 +1,8 @@
 from typing import Dict, Optional, Tuple, List, Set, Any
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from app.extensions import db
 from app.models import Template, TemplateStats, User, TemplateVersion, EmailJob
-from app.services.search_service import TemplateSearchService
 from app.utils.logging import logger
 from datetime import datetime, timezone
 from bs4 import BeautifulSoup
@@ -196,8 +196,6 @@ class TemplateService:
                 }
             )
 
-            # Update search vector
-            TemplateSearchService.update_search_vector(template)
             db.session.add(template)
             db.session.commit()  # Commit to get template.id
 
@@ -279,9 +277,6 @@ class TemplateService:
                 'previous_version': template.version - 1
             }
 
-            # Update search vector
-            TemplateSearchService.update_search_vector(template)
-
             # Add notification
             user = User.query.get_or_404(user_id)
             user.add_notification(
@@ -300,6 +295,9 @@ class TemplateService:
             db.session.commit()
             return template, None
 
+        except StaleDataError:
+            db.session.rollback()
+            return None, "Template was modified by another request, please reload and try again"
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Error updating template: {str(e)}")
@@ -565,16 +563,11 @@ class TemplateService:
             if not target_version:
                 return None, f"Version {version} not found"
 
-            # Get the next version number for archiving
-            next_version = db.session.query(db.func.max(TemplateVersion.version)).filter(
-                TemplateVersion.template_id == template_id
-            ).scalar() or 0
-            next_version += 1
-
-            # Archive current version with the next version number
+            # Archived versions run 1..version-1, so the current content
+            # is archived under its own number, as update_template does
             current_version = TemplateVersion(
                 template_id=template_id,
-                version=next_version,
+                version=template.version,
                 html_content=template.html_content,
                 change_summary=f"Auto-archived before reverting to version {
                     version}",
@@ -590,7 +583,7 @@ class TemplateService:
 
             # Update template with target version content
             template.html_content = target_version.html_content
-            template.version = next_version + 1  # Set to next version after archive
+            template.version += 1  # Set to next version after archive
             template.updated_at = datetime.now(timezone.utc)
             template.meta_data = {
                 **(template.meta_data or {}),
@@ -616,6 +609,9 @@ class TemplateService:
             db.session.commit()
             return template, None
 
+        except StaleDataError:
+            db.session.rollback()
+            return None, "Template was modified by another request, please reload and try again"
         except SQLAlchemyError as e:
             db.session.rollback()
             logger.error(f"Error reverting template: {str(e)}")
@@ -0,0 +1,13 @@
+from typing import Dict, Any
+from celery import shared_task
+from app.services.api_key_service import ApiKeyService
+
+
+@shared_task
+def flush_api_key_usage() -> Dict[str, Any]:
+    """Write API key usage buffered in Redis to the api_keys table."""
+    flushed, error = ApiKeyService.flush_buffered_usage()
+    return {
+        'flushed': flushed,
+        'error': error
+    }
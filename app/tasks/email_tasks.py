@@ -1,3 +1,4 @@
+import logging
 from celery import shared_task, Task
 from typing import Optional, Dict, Any, List
 from app.services.mail_service import MailService
@@ -90,6 +91,7 @@ def send_single_email_task(self, job_id: int) -> bool:
 
             job.completed_at = datetime.now(timezone.utc)
             db.session.commit()
+            job_control.invalidate_job_progress(job_id, job.user_id)
 
             # Notify via webhooks
             webhook_service = WebhookService()
@@ -179,6 +181,7 @@ def send_templated_email(self, job_id: int) -> Dict[str, Any]:
 
             job.completed_at = datetime.now(timezone.utc)
             db.session.commit()
+            job_control.invalidate_job_progress(job_id, job.user_id)
 
             # Notify via webhooks
             webhook_service = WebhookService()
@@ -203,6 +206,7 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
     from app import create_app
     app = create_app()
     with app.app_context():
+        claimed_ids = []
         try:
             job = EmailJob.query.get(job_id)
             if not job:
@@ -221,11 +225,19 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
                     "job_id": job_id
                 }
 
+            # A lease recheck can land after another worker finished the job
+            if job.status in (EmailJob.STATUS_COMPLETED, EmailJob.STATUS_FAILED):
+                return {
+                    "status": job.status,
+                    "job_id": job_id
+                }
+
             # Update job status
             if job.status == EmailJob.STATUS_PENDING:
                 job.status = EmailJob.STATUS_PROCESSING
                 job.started_at = datetime.now(timezone.utc)
                 db.session.commit()
+                job_control.invalidate_job_progress(job_id, job.user_id)
 
                 # Notify start via webhook if configured
                 webhook_service = WebhookService()
@@ -234,7 +246,8 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
             # Check if all deliveries are already processed
             pending_count = EmailDelivery.query.filter(
                 EmailDelivery.job_id == job_id,
-                EmailDelivery.status == EmailDelivery.STATUS_PENDING
+                EmailDelivery.status.in_([EmailDelivery.STATUS_PENDING,
+                                          EmailDelivery.STATUS_SENDING])
             ).count()
 
             if pending_count == 0:
@@ -242,6 +255,7 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
                 job.status = EmailJob.STATUS_COMPLETED
                 job.completed_at = datetime.now(timezone.utc)
                 db.session.commit()
+                job_control.invalidate_job_progress(job_id, job.user_id)
 
                 # Notify completion via webhook
                 webhook_service = WebhookService()
@@ -254,52 +268,76 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
                     "failure_count": job.failure_count
                 }
 
-            # Get pending deliveries for this batch
-            deliveries = EmailDelivery.query.filter(
-                EmailDelivery.job_id == job_id,
-                EmailDelivery.status == EmailDelivery.STATUS_PENDING
-            ).limit(batch_size).all()
+            # Claim this batch; parallel workers skip each other's rows
+            mail_service = MailService()
+            deliveries = mail_service.claim_pending_deliveries(
+                job_id, batch_size)
+            claimed_ids = [delivery.id for delivery in deliveries]
 
             # Process each delivery
             template_service = TemplateService()
-            mail_service = MailService()
+            webhook_service = WebhookService()
+            interrupted = None
 
-            for delivery in deliveries:
-                try:
+            def mark_failed(delivery, error):
+                delivery.status = EmailDelivery.STATUS_FAILED
+                delivery.error_message = error
+                delivery.last_attempt = datetime.now(timezone.utc)
+                delivery.attempts += 1
+                job.failure_count += 1
+                db.session.commit()
+                webhook_service.notify_delivery_status(delivery.id, 'failed')
+
+            def pending_messages():
+                nonlocal interrupted
+                for delivery in deliveries:
                     # Check for stop/pause again
                     if job_control.is_job_stopped(job_id):
-                        return {"status": "stopped", "job_id": job_id}
+                        interrupted = 'stopped'
+                        return
                     if job_control.is_job_paused(job_id):
-                        return {"status": "paused", "job_id": job_id}
-
-                    # Render template if using one
-                    if job.template_id:
-                        template = template_service.get_template(
-                            job.template_id, job.user_id)
-                        if not template:
-                            raise ValueError(
-                                f"Template {job.template_id} not found or deleted")
-
-                        rendered_content, error = template_service.render_template_for_send(
-                            template_id=job.template_id,
-                            user_id=job.user_id,
-                            variables=delivery.variables
-                        )
-                        if error:
-                            raise ValueError(f"Template rendering failed: {error}")
-                        body = rendered_content
-                    else:
-                        body = job.body
-
-                    # Send email
-                    success, error = mail_service.send_raw_email(
-                        user_id=job.user_id,
-                        to_email=delivery.recipient,
-                        subject=job.subject,
-                        body=body,
-                        smtp_config=job.smtp_config
-                    )
-
+                        interrupted = 'paused'
+                        return
+
+                    try:
+                        # Render template if using one
+                        if job.template_id:
+                            template = template_service.get_template(
+                                job.template_id, job.user_id)
+                            if not template:
+                                raise ValueError(
+                                    f"Template {job.template_id} not found or deleted")
+
+                            rendered_content, error = template_service.render_template_for_send(
+                                template_id=job.template_id,
+                                user_id=job.user_id,
+                                variables=delivery.variables
+                            )
+                            if error:
+                                raise ValueError(f"Template rendering failed: {error}")
+                            body = rendered_content
+                        else:
+                            body = job.body
+                    except Exception as e:
+                        mark_failed(delivery, str(e))
+                        continue
+
+                    yield {
+                        'to_email': delivery.recipient,
+                        'subject': job.subject,
+                        'body': body,
+                        'delivery': delivery
+                    }
+
+            # Send the whole batch over a few pooled SMTP sessions
+            for message, success, error in mail_service.send_emails_bulk(
+                user_id=job.user_id,
+                messages=pending_messages(),
+                smtp_config=job.smtp_config,
+                concurrency=mail_service.BULK_SEND_CONCURRENCY
+            ):
+                delivery = message['delivery']
+                try:
                     # Update delivery status
                     delivery.last_attempt = datetime.now(timezone.utc)
                     delivery.attempts += 1
@@ -321,25 +359,46 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
                     )
 
                 except Exception as e:
-                    delivery.status = EmailDelivery.STATUS_FAILED
-                    delivery.error_message = str(e)
-                    delivery.last_attempt = datetime.now(timezone.utc)
-                    delivery.attempts += 1
-                    job.failure_count += 1
-                    db.session.commit()
-                    webhook_service.notify_delivery_status(delivery.id, 'failed')
+                    db.session.rollback()
+                    mark_failed(delivery, str(e))
+
+            if interrupted:
+                # Hand back claimed deliveries this batch never sent
+                if interrupted == 'stopped':
+                    mail_service.release_claimed_deliveries(
+                        claimed_ids, 'cancelled', 'Job stopped by user')
+                else:
+                    mail_service.release_claimed_deliveries(claimed_ids)
+                return {"status": interrupted, "job_id": job_id}
+
+            # Progress snapshots are stale once the batch has been sent
+            job_control.invalidate_job_progress(job_id, job.user_id)
 
             # Check remaining deliveries after processing batch
-            remaining = EmailDelivery.query.filter_by(
+            remaining = mail_service.count_claimable_deliveries(job_id)
+
+            # Another worker still sending its batch will finish the job;
+            # look again once its lease is up in case that worker died
+            if remaining == 0 and EmailDelivery.query.filter_by(
                 job_id=job_id,
-                status=EmailDelivery.STATUS_PENDING
-            ).count()
+                status=EmailDelivery.STATUS_SENDING
+            ).first() is not None:
+                process_email_batch.apply_async(
+                    (job_id, batch_size),
+                    countdown=EmailDelivery.CLAIM_LEASE.total_seconds())
+                return {
+                    "status": "processing",
+                    "job_id": job_id,
+                    "batch_processed": len(deliveries),
+                    "remaining": remaining
+                }
 
             if remaining == 0:
                 # All deliveries processed, update job status
                 job.status = EmailJob.STATUS_COMPLETED
                 job.completed_at = datetime.now(timezone.utc)
                 db.session.commit()
+                job_control.invalidate_job_progress(job_id, job.user_id)
 
                 # Notify completion via webhook
                 webhook_service.notify_job_status(job_id, 'completed')
@@ -367,6 +426,14 @@ def process_email_batch(self, job_id: int, batch_size: int = 50) -> Dict[str, An
             # Log error and retry
             current_app.logger.error(
                 f"Batch email error for job {job_id}: {str(e)}")
+            # Unsent claims go back to pending so the retry can pick them up
+            try:
+                db.session.rollback()
+                MailService.release_claimed_deliveries(claimed_ids)
+            except Exception as release_error:
+                db.session.rollback()
+                current_app.logger.error(
+                    f"Error releasing deliveries for job {job_id}: {str(release_error)}")
             raise self.retry(exc=e, countdown=60 * (self.request.retries + 1))
 
 
@@ -382,21 +449,17 @@ def send_internal_email_task(
     app = create_app()
     with app.app_context():
         try:
-            logger.info(
-                f"Starting to send internal email to {to_email}")
-            logger.debug("SMTP Configuration:")
-            logger.debug(
-                f"Host: {current_app.config.get('SYSTEM_SMTP_HOST')}")
-            logger.debug(
-                f"Port: {current_app.config.get('SYSTEM_SMTP_PORT')}")
-            logger.debug(
-                f"Username: {current_app.config.get('SYSTEM_SMTP_USERNAME')}")
-            logger.debug(
-                f"From Email: {current_app.config.get('SYSTEM_SMTP_FROM_EMAIL')}")
-            logger.debug(
-                f"Use TLS: {current_app.config.get('SYSTEM_SMTP_USE_TLS')}")
-
-            logger.info(f"Sending internal email to {to_email}")
+            logger.info("Starting to send internal email to %s", to_email)
+            if logger.isEnabledFor(logging.DEBUG):
+                config = current_app.config
+                logger.debug("SMTP Configuration:")
+                logger.debug("Host: %s", config.get('SYSTEM_SMTP_HOST'))
+                logger.debug("Port: %s", config.get('SYSTEM_SMTP_PORT'))
+                logger.debug("Username: %s", config.get('SYSTEM_SMTP_USERNAME'))
+                logger.debug("From Email: %s", config.get('SYSTEM_SMTP_FROM_EMAIL'))
+                logger.debug("Use TLS: %s", config.get('SYSTEM_SMTP_USE_TLS'))
+
+            logger.info("Sending internal email to %s", to_email)
 
             # Get system SMTP configuration from environment
             smtp_config = SMTPConfiguration(
@@ -409,8 +472,8 @@ def send_internal_email_task(
                 from_email=current_app.config['SYSTEM_SMTP_FROM_EMAIL']
             )
 
-            logger.debug(f"Using SMTP config: {
-                smtp_config.host}:{smtp_config.port}")
+            logger.debug("Using SMTP config: %s:%s",
+                         smtp_config.host, smtp_config.port)
 
             # Create MailService instance
             mail_service = MailService()
@@ -427,7 +490,7 @@ def send_internal_email_task(
                 logger.error(f"Failed to send internal email: {error}")
                 raise self.retry(exc=Exception(error), countdown=60)
 
-            logger.info(f"Successfully sent internal email to {to_email}")
+            logger.info("Successfully sent internal email to %s", to_email)
             return True
 
         except Exception as e:
@@ -14,6 +14,14 @@ CELERYBEAT_SCHEDULE = {
         'task': 'app.tasks.email_tasks.clean_up_stale_jobs',
         'schedule': crontab(minute='*/15'),  # Every 15 minutes
     },
+    'flush-api-key-usage': {
+        'task': 'app.tasks.api_key_tasks.flush_api_key_usage',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'flush-smtp-send-counters': {
+        'task': 'app.tasks.smtp_tasks.flush_smtp_send_counters',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
 }
 
 # Additional Celery configurations
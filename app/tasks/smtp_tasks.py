@@ -0,0 +1,13 @@
+from typing import Dict, Any
+from celery import shared_task
+from app.services.smtp_service import SMTPService
+
+
+@shared_task
+def flush_smtp_send_counters() -> Dict[str, Any]:
+    """Write SMTP daily send counters kept in Redis to the database."""
+    flushed, error = SMTPService.flush_send_counters()
+    return {
+        'flushed': flushed,
+        'error': error
+    }
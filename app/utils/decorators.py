@@ -47,12 +47,18 @@ def require_api_key(f):
         try:
             status_code = response[1] if isinstance(response, tuple) else 200
 
-            # Ensure we have a fresh instance of the API key
-            api_key = db.session.merge(api_key)
+            # Counters go to Redis and are flushed by a periodic task; the
+            # key row is only written here when Redis is unavailable
+            buffered = ApiKeyService.buffer_usage(api_key.id)
+
+            # Attach the key to the session; cached keys are detached and
+            # only the columns touched by tracking need loading
+            api_key = db.session.merge(api_key, load=False)
 
             # Start a new transaction for usage tracking
             db.session.begin_nested()
-            api_key.track_usage(request.path, status_code)
+            api_key.track_usage(request.path, status_code,
+                                update_counters=not buffered)
             db.session.flush()  # Flush changes before commit
 
             db.session.commit()
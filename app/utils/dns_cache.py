@@ -0,0 +1,52 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+TTL = 60  # seconds
+MAX_ENTRIES = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def resolve(host: str, port: int) -> Tuple[str, ...]:
+    """
+    Resolve a host for a TCP connection, reusing answers for TTL seconds.
+
+    Failed lookups raise socket.gaierror and are not cached.
+
+    Args:
+        host: Hostname or IP literal
+        port: Port the connection will use
+
+    Returns:
+        Every address of the host in getaddrinfo order, to be tried in
+        turn like socket.create_connection does
+    """
+    key = (host, port)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[1] > now:
+            _cache.move_to_end(key)
+            return entry[0]
+
+    addresses = tuple(dict.fromkeys(
+        sockaddr[0] for _, _, _, _, sockaddr
+        in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)))
+
+    with _lock:
+        _cache[key] = (addresses, now + TTL)
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return addresses
+
+
+def invalidate(host: str) -> None:
+    """Forget cached answers for a host, e.g. after connecting to it failed."""
+    with _lock:
+        for key in [key for key in _cache if key[0] == host]:
+            del _cache[key]
@@ -1,6 +1,7 @@
 from cryptography.fernet import Fernet
 from flask import current_app
 from base64 import b64encode, b64decode
+from functools import lru_cache
 
 
 def generate_key():
@@ -63,3 +64,32 @@ def decrypt_value(encrypted_value: str) -> str:
     except Exception as e:
         current_app.logger.error(f"Decryption error: {str(e)}")
         raise ValueError("Failed to decrypt value") from e
+
+
+@lru_cache(maxsize=256)
+def _decrypt_with_key(encrypted_value: str, key) -> str:
+    f = Fernet(key)
+    return f.decrypt(b64decode(encrypted_value)).decode()
+
+
+def decrypt_value_cached(encrypted_value: str) -> str:
+    """
+    Decrypt a value, reusing the result for ciphertexts seen before.
+
+    Fernet ciphertexts change whenever a secret is re-encrypted, so an
+    updated SMTP password never hits a stale entry.
+
+    Args:
+        encrypted_value: Base64 encoded encrypted string
+
+    Returns:
+        Decrypted string
+    """
+    if not encrypted_value:
+        return encrypted_value
+
+    try:
+        return _decrypt_with_key(encrypted_value, get_encryption_key())
+    except Exception as e:
+        current_app.logger.error(f"Decryption error: {str(e)}")
+        raise ValueError("Failed to decrypt value") from e
@@ -97,3 +97,9 @@ ROLE_CONFIGURATIONS: Dict[str, Dict[str, Any]] = {
         'features': ['all']
     }
 }
+
+# Flat lookup for the daily email limit, checked on every send
+ROLE_DAILY_EMAIL_LIMITS: Dict[str, int] = {
+    role: config['limits'][ResourceLimit.DAILY_EMAILS.value]
+    for role, config in ROLE_CONFIGURATIONS.items()
+}
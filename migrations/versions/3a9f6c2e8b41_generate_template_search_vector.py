@@ -0,0 +1,50 @@
+"""Generate template search_vector in the database
+
+Revision ID: 3a9f6c2e8b41
+Revises: 7d2e4b9c1a53
+Create Date: 2025-01-19 16:05:48.271906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.utils.db import TSVectorType
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9f6c2e8b41'
+down_revision = '7d2e4b9c1a53'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(html_content, '')), 'C')"
+)
+
+
+def upgrade():
+    # An existing column cannot be turned into a generated one, so the
+    # vector is recreated and Postgres fills it for every row
+    with op.batch_alter_table('templates', schema=None) as batch_op:
+        batch_op.drop_index('idx_template_search', postgresql_using='gin')
+        batch_op.drop_column('search_vector')
+        batch_op.add_column(sa.Column(
+            'search_vector', TSVectorType(),
+            sa.Computed(SEARCH_VECTOR_SQL, persisted=True)))
+        batch_op.create_index('idx_template_search', ['search_vector'],
+                              unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('templates', schema=None) as batch_op:
+        batch_op.drop_index('idx_template_search', postgresql_using='gin')
+        batch_op.drop_column('search_vector')
+        batch_op.add_column(sa.Column(
+            'search_vector', TSVectorType(), nullable=True))
+
+    op.execute(f"UPDATE templates SET search_vector = {SEARCH_VECTOR_SQL}")
+
+    with op.batch_alter_table('templates', schema=None) as batch_op:
+        batch_op.create_index('idx_template_search', ['search_vector'],
+                              unique=False, postgresql_using='gin')
@@ -0,0 +1,33 @@
+"""Added delivery engagement index
+
+Revision ID: 7d2e4b9c1a53
+Revises: c6e1f0a9d7b3
+Create Date: 2025-01-19 14:37:02.918344
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4b9c1a53'
+down_revision = 'c6e1f0a9d7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction; this keeps tracking
+    # writes to email_deliveries flowing while the index builds
+    with op.get_context().autocommit_block():
+        op.create_index('idx_delivery_job_engagement', 'email_deliveries',
+                        ['job_id'], unique=False,
+                        postgresql_include=['opened_at', 'clicked_at'],
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_delivery_job_engagement',
+                      table_name='email_deliveries',
+                      postgresql_concurrently=True)
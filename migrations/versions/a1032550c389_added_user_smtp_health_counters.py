@@ -0,0 +1,45 @@
+"""Added user SMTP health counters
+
+Revision ID: a1032550c389
+Revises: f3428a7b8f8b
+Create Date: 2025-01-18 10:12:41.208533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1032550c389'
+down_revision = 'f3428a7b8f8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_smtp_health',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('healthy', sa.Integer(), nullable=False),
+    sa.Column('warning', sa.Integer(), nullable=False),
+    sa.Column('critical', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Seed counters from the existing active configurations
+    op.execute("""
+        INSERT INTO user_smtp_health (user_id, total, healthy, warning, critical)
+        SELECT user_id,
+               count(*),
+               count(*) FILTER (WHERE coalesce(failure_count, 0) = 0),
+               count(*) FILTER (WHERE failure_count BETWEEN 1 AND 3),
+               count(*) FILTER (WHERE failure_count > 3)
+        FROM smtp_configurations
+        WHERE is_active IS NOT FALSE
+        GROUP BY user_id
+    """)
+
+
+def downgrade():
+    op.drop_table('user_smtp_health')
@@ -0,0 +1,64 @@
+"""Added covering indexes for analytics
+
+Revision ID: b202481411be
+Revises: a4c5e5797e82
+Create Date: 2025-01-18 15:21:09.734520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b202481411be'
+down_revision = 'a4c5e5797e82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction; this keeps writes
+    # to the tables flowing while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index('idx_email_jobs_user_created', 'email_jobs',
+                        ['user_id', 'created_at'], unique=False,
+                        postgresql_include=['recipient_count', 'success_count',
+                                            'failure_count'],
+                        postgresql_concurrently=True)
+        op.create_index('idx_email_jobs_template', 'email_jobs',
+                        ['template_id'], unique=False,
+                        postgresql_include=['recipient_count', 'success_count'],
+                        postgresql_concurrently=True)
+        op.create_index('idx_email_jobs_smtp', 'email_jobs',
+                        ['smtp_config_id'], unique=False,
+                        postgresql_include=['recipient_count', 'success_count'],
+                        postgresql_concurrently=True)
+        op.create_index('idx_api_key_usage_covering', 'api_key_usage',
+                        ['api_key_id', 'timestamp'], unique=False,
+                        postgresql_include=['status_code', 'endpoint'],
+                        postgresql_concurrently=True)
+        op.create_index('idx_api_keys_prefix_active', 'api_keys',
+                        ['key_prefix'], unique=False,
+                        postgresql_where=sa.text('is_active'),
+                        postgresql_concurrently=True)
+        # Superseded by idx_api_key_usage_covering
+        op.drop_index('idx_api_key_usage_key_timestamp',
+                      table_name='api_key_usage',
+                      postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_api_key_usage_key_timestamp', 'api_key_usage',
+                        ['api_key_id', 'timestamp'], unique=False,
+                        postgresql_concurrently=True)
+        op.drop_index('idx_api_keys_prefix_active', table_name='api_keys',
+                      postgresql_concurrently=True)
+        op.drop_index('idx_api_key_usage_covering', table_name='api_key_usage',
+                      postgresql_concurrently=True)
+        op.drop_index('idx_email_jobs_smtp', table_name='email_jobs',
+                      postgresql_concurrently=True)
+        op.drop_index('idx_email_jobs_template', table_name='email_jobs',
+                      postgresql_concurrently=True)
+        op.drop_index('idx_email_jobs_user_created', table_name='email_jobs',
+                      postgresql_concurrently=True)
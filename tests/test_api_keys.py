@@ -0,0 +1,101 @@
+import fakeredis
+import pytest
+from unittest.mock import patch
+from app.models import User
+from app.models.api_key import ApiKey
+from app.services.api_key_service import ApiKeyService
+from app.extensions import db
+
+
+@pytest.fixture
+def redis():
+    """Real Redis semantics for the API key cache."""
+    fake = fakeredis.FakeRedis()
+    with patch('app.services.api_key_service.redis_client', fake):
+        yield fake
+
+
+@pytest.fixture
+def api_key(app, redis):
+    """Create a user with one live API key."""
+    with app.app_context():
+        user = User(
+            name='Key Owner',
+            email='keys@example.com',
+            password_hash='test_hash',
+            role='pro',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        key, plain, error = ApiKeyService.create_key(user.id, 'Test key')
+        assert error is None
+        return key.id, user.id, key.key_prefix, plain
+
+
+class TestApiKeyCache:
+    def test_miss_then_hit(self, app, redis, api_key):
+        """The first lookup reads the row, later ones the cache."""
+        key_id, _, prefix, plain = api_key
+        with app.app_context():
+            found, error = ApiKeyService.validate_key(plain)
+            assert error is None and found.id == key_id
+            assert redis.exists(ApiKeyService._get_cache_key(prefix))
+
+            # Deactivate behind the cache's back; the cached entry still answers
+            ApiKey.query.filter_by(id=key_id).update({'is_active': False})
+            db.session.commit()
+            found, error = ApiKeyService.validate_key(plain)
+            assert error is None and found.id == key_id
+
+    def test_unknown_prefix_cached_as_missing(self, app, redis, api_key):
+        """Unknown prefixes are remembered briefly as misses."""
+        with app.app_context():
+            found, error = ApiKeyService.validate_key('ms_deadbeef_secret')
+
+        assert found is None and error == "API key not found"
+        assert redis.get(ApiKeyService._get_cache_key('deadbeef')) == \
+            ApiKeyService.MISSING_MARKER.encode()
+
+    def test_revoked_key_rejected(self, app, redis, api_key):
+        """Revoking a key drops its cached lookup."""
+        key_id, user_id, _, plain = api_key
+        with app.app_context():
+            assert ApiKeyService.validate_key(plain)[0] is not None
+            assert ApiKeyService.revoke_key(key_id, user_id) == (True, None)
+
+            found, error = ApiKeyService.validate_key(plain)
+            assert found is None and error == "API key not found"
+
+    def test_lookup_racing_revoke_not_cached(self, app, redis, api_key):
+        """A lookup that read the row before a revoke cannot cache it."""
+        key_id, user_id, prefix, plain = api_key
+        with app.app_context():
+            # A validator misses the cache and reads the still active row...
+            hit, _, version = ApiKeyService._get_cached_key(prefix)
+            assert not hit
+            stale = ApiKey.query.filter_by(key_prefix=prefix).first()
+
+            # ...the key is revoked before it writes the cache entry
+            assert ApiKeyService.revoke_key(key_id, user_id) == (True, None)
+            ApiKeyService._cache_key_lookup(prefix, stale, version)
+
+            assert not redis.exists(ApiKeyService._get_cache_key(prefix))
+            found, error = ApiKeyService.validate_key(plain)
+            assert found is None and error == "API key not found"
+
+    def test_expired_keys_invalidated(self, app, redis, api_key):
+        """Keys revoked by expiry cleanup drop their cached lookup."""
+        key_id, _, prefix, plain = api_key
+        with app.app_context():
+            assert ApiKeyService.validate_key(plain)[0] is not None
+            ApiKey.query.filter_by(id=key_id).update(
+                {'expires_at': db.func.now() - db.text("interval '1 day'")},
+                synchronize_session=False)
+            db.session.commit()
+
+            assert ApiKeyService.cleanup_expired_keys() == 1
+            assert not redis.exists(ApiKeyService._get_cache_key(prefix))
+            assert ApiKeyService.validate_key(plain)[0] is None
@@ -1,7 +1,9 @@
 import pytest
+from unittest.mock import patch
 from app.models.user import User
 from app.extensions import db
-from werkzeug.security import generate_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.services.auth_services import AuthenticationService
 
 
 def test_register_user(client):
@@ -62,3 +64,47 @@ def test_role_based_access(app, client, auth_headers, role, expected_status):
         headers={'Authorization': auth_headers['Authorization']}
     )
     assert response.status_code == expected_status
+
+
+@pytest.fixture
+def kdf_calls():
+    """Count full password hash checks, starting from an empty failure cache."""
+    from app.services import auth_services
+    auth_services._failed_checks.clear()
+    calls = []
+
+    def counting_check(password_hash, password):
+        calls.append(password_hash)
+        return check_password_hash(password_hash, password)
+
+    with patch('app.services.auth_services.check_password_hash',
+               side_effect=counting_check):
+        yield calls
+    auth_services._failed_checks.clear()
+
+
+def test_failed_login_cache_does_not_reveal_accounts(app, kdf_calls):
+    """Unknown and known emails pay for the same hash checks."""
+    with app.app_context():
+        user = User(
+            name='Known',
+            email='known@example.com',
+            password_hash=generate_password_hash('right-password'),
+            is_active=True,
+            email_verified=True
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        for email in ('ghost1@example.com', 'ghost2@example.com',
+                      'known@example.com'):
+            with pytest.raises(ValueError):
+                AuthenticationService.authenticate_user(email, 'sprayed')
+        # Each email's first try runs the KDF, known or not
+        assert len(kdf_calls) == 3
+
+        for email in ('ghost1@example.com', 'known@example.com'):
+            with pytest.raises(ValueError):
+                AuthenticationService.authenticate_user(email, 'sprayed')
+        # Repeats are cache hits for both
+        assert len(kdf_calls) == 3
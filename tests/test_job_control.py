@@ -0,0 +1,70 @@
+import fakeredis
+import pytest
+from unittest.mock import MagicMock, patch
+from app.models import User, EmailJob, AuditLog
+from app.services.job_control_service import JobControlService
+from app.extensions import db
+from app.tasks import email_tasks
+
+
+@pytest.fixture(autouse=True)
+def services():
+    """Real Redis semantics for control flags; no webhooks or task queue."""
+    with patch('app.services.job_control_service.redis_client',
+               fakeredis.FakeRedis()), \
+            patch('app.services.job_control_service.WebhookService'), \
+            patch.dict(email_tasks.__dict__,
+                       {'process_email_batch': MagicMock()}):
+        yield
+
+
+@pytest.fixture
+def job(app):
+    with app.app_context():
+        user = User(
+            name='Sender',
+            email='sender@example.com',
+            password_hash='test_hash',
+            role='pro',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        job = EmailJob(user_id=user.id, subject='Test Subject',
+                       body='Test Body', status=EmailJob.STATUS_PROCESSING)
+        db.session.add(job)
+        db.session.commit()
+        return job.id, user.id
+
+
+def job_audit_logs(job_id):
+    return AuditLog.query.filter_by(
+        model_name='EmailJob', record_id=job_id, operation='UPDATE'
+    ).order_by(AuditLog.id).all()
+
+
+class TestJobControlAudit:
+    def test_transitions_are_audited(self, app, job):
+        """Pause, resume and stop each leave an audit row."""
+        job_id, user_id = job
+        with app.app_context():
+            assert JobControlService.pause_job(job_id, user_id)
+            assert JobControlService.resume_job(job_id, user_id)
+            assert JobControlService.stop_job(job_id, user_id)
+
+            logs = job_audit_logs(job_id)
+            assert [log.changes['status'] for log in logs] == [
+                'paused', 'processing', 'stopped']
+            assert 'paused_at' in logs[0].changes['meta_data']
+            assert logs[2].changes['meta_data']['stop_reason'] == 'user_requested'
+            assert logs[2].changes['completed_at'] is not None
+
+    def test_rejected_transition_not_audited(self, app, job):
+        """A transition the job's state doesn't allow writes nothing."""
+        job_id, user_id = job
+        with app.app_context():
+            assert not JobControlService.resume_job(job_id, user_id)
+            assert not JobControlService.pause_job(job_id, user_id + 1)
+            assert job_audit_logs(job_id) == []
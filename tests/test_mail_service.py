@@ -0,0 +1,261 @@
+import smtplib
+import fakeredis
+import time
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.models import User, EmailJob, EmailDelivery
+from app.services.mail_service import MailService
+from app.extensions import db
+
+
+@pytest.fixture
+def job(app):
+    """Create a job with five pending deliveries."""
+    with app.app_context():
+        user = User(
+            name='Sender',
+            email='sender@example.com',
+            password_hash='test_hash',
+            role='pro',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        job = EmailJob(
+            user_id=user.id,
+            subject='Test Subject',
+            body='Test Body',
+            status=EmailJob.STATUS_PROCESSING,
+            recipient_count=5
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        for i in range(5):
+            db.session.add(EmailDelivery(
+                job_id=job.id, recipient=f'user{i}@example.com'))
+        db.session.commit()
+        return job.id
+
+
+def statuses(job_id):
+    return [d.status for d in EmailDelivery.query.filter_by(
+        job_id=job_id).order_by(EmailDelivery.id)]
+
+
+class TestDeliveryClaims:
+    def test_claim_takes_oldest_pending(self, app, job):
+        """Claimed deliveries move to sending and carry a lease."""
+        with app.app_context():
+            claimed = MailService.claim_pending_deliveries(job, 3)
+
+            assert [d.recipient for d in claimed] == [
+                'user0@example.com', 'user1@example.com', 'user2@example.com']
+            assert all(d.last_attempt is not None for d in claimed)
+            assert statuses(job) == ['sending'] * 3 + ['pending'] * 2
+
+    def test_claims_do_not_overlap(self, app, job):
+        """A second claim only gets rows the first one left."""
+        with app.app_context():
+            first = MailService.claim_pending_deliveries(job, 3)
+            second = MailService.claim_pending_deliveries(job, 3)
+
+            assert len(second) == 2
+            assert not {d.id for d in first} & {d.id for d in second}
+            assert MailService.claim_pending_deliveries(job, 3) == []
+            assert MailService.count_claimable_deliveries(job) == 0
+
+    def test_release_returns_claims(self, app, job):
+        """Released deliveries are pending again without a lease."""
+        with app.app_context():
+            claimed = MailService.claim_pending_deliveries(job, 2)
+            MailService.release_claimed_deliveries([d.id for d in claimed])
+
+            assert statuses(job) == ['pending'] * 5
+            assert EmailDelivery.query.filter(
+                EmailDelivery.last_attempt.isnot(None)).count() == 0
+
+    def test_release_cancels_claims(self, app, job):
+        """Claims released by a stopped job are cancelled."""
+        with app.app_context():
+            claimed = MailService.claim_pending_deliveries(job, 2)
+            MailService.release_claimed_deliveries(
+                [d.id for d in claimed], 'cancelled', 'Job stopped by user')
+
+            assert statuses(job) == ['cancelled'] * 2 + ['pending'] * 3
+
+    def test_crashed_claim_is_reclaimed(self, app, job):
+        """Deliveries held by a dead worker are claimed once the lease expires."""
+        with app.app_context():
+            crashed = MailService.claim_pending_deliveries(job, 2)
+            MailService.claim_pending_deliveries(job, 3)
+            assert MailService.claim_pending_deliveries(job, 5) == []
+
+            EmailDelivery.query.filter(
+                EmailDelivery.id.in_([d.id for d in crashed])
+            ).update({
+                'last_attempt': datetime.now(timezone.utc)
+                - EmailDelivery.CLAIM_LEASE * 2
+            }, synchronize_session=False)
+            db.session.commit()
+
+            assert MailService.count_claimable_deliveries(job) == 2
+            reclaimed = MailService.claim_pending_deliveries(job, 5)
+            assert [d.id for d in reclaimed] == [d.id for d in crashed]
+            assert all(d.status == 'sending' for d in reclaimed)
+
+
+class FakeSMTP:
+    """SMTP session that records sends; later recipients finish first."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.sent = []
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if to_addrs[0] in self.pool.disconnect:
+            self.pool.disconnect.discard(to_addrs[0])
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        time.sleep(0.05 / (len(self.pool.delivered) + 1))
+        self.sent.append(to_addrs[0])
+        self.pool.delivered.append(to_addrs[0])
+
+    def noop(self):
+        return 250, b'OK'
+
+
+class FakePool:
+    """Stand-in for the SMTP connection pool."""
+    MAX_CONNECTIONS = 5
+
+    def __init__(self):
+        self.acquired = []
+        self.released = []
+        self.delivered = []
+        self.disconnect = set()
+
+    def acquire(self, server, password):
+        conn = SimpleNamespace(smtp=FakeSMTP(self), sent=0)
+        self.acquired.append(conn)
+        return conn
+
+    def release(self, conn, healthy=True):
+        self.released.append((conn, healthy))
+
+
+@pytest.fixture
+def pool():
+    with patch('app.services.mail_service.smtp_pool', FakePool()) as pool:
+        yield pool
+
+
+def system_config():
+    return SimpleNamespace(host='smtp.example.com', port=587, username='u',
+                           password='p', use_tls=True,
+                           from_email='noreply@example.com')
+
+
+def bulk_messages(count):
+    return [{'to_email': f'user{i}@example.com', 'subject': 'Hello',
+             'body': 'Body'} for i in range(count)]
+
+
+class TestSendEmailsBulk:
+    def test_results_in_send_order(self, app, pool):
+        """Concurrent sends are reported in the order they were given."""
+        messages = bulk_messages(8)
+        with app.app_context():
+            results = list(MailService().send_emails_bulk(
+                None, messages, system_config(),
+                is_system_email=True, concurrency=4))
+
+        assert [r[0] for r in results] == messages
+        assert all(success for _, success, _ in results)
+        assert sorted(pool.delivered) == sorted(
+            m['to_email'] for m in messages)
+        assert len(pool.acquired) <= 4
+
+    def test_session_reused(self, app, pool):
+        """Sequential sends share one session, returned to the pool once."""
+        with app.app_context():
+            results = list(MailService().send_emails_bulk(
+                None, bulk_messages(5), system_config(),
+                is_system_email=True))
+
+        assert all(success for _, success, _ in results)
+        assert len(pool.acquired) == 1
+        assert pool.acquired[0].sent == 5
+        assert pool.released == [(pool.acquired[0], True)]
+
+    def test_dropped_session_replaced(self, app, pool):
+        """A disconnected session is discarded and the send retried."""
+        pool.disconnect.add('user1@example.com')
+        with app.app_context():
+            results = list(MailService().send_emails_bulk(
+                None, bulk_messages(3), system_config(),
+                is_system_email=True))
+
+        assert all(success for _, success, _ in results)
+        assert pool.delivered == [
+            'user0@example.com', 'user1@example.com', 'user2@example.com']
+        first, second = pool.acquired
+        assert pool.released == [(first, False), (second, True)]
+
+
+@pytest.fixture
+def redis():
+    """Real Redis semantics for the quota counters."""
+    fake = fakeredis.FakeRedis()
+    with patch('app.services.mail_service.redis_client', fake), \
+            patch('app.services.quota_service.redis_client', fake):
+        yield fake
+
+
+def add_job(user_id, recipient_count):
+    job = EmailJob(user_id=user_id, subject='Test Subject', body='Test Body',
+                   recipient_count=recipient_count)
+    db.session.add(job)
+    db.session.commit()
+    MailService.count_job_recipients(user_id, recipient_count)
+
+
+class TestSendingQuota:
+    def cached_total(self, redis, user_id):
+        key = MailService._get_job_recipients_key(
+            user_id, datetime.now(timezone.utc).date())
+        value = redis.get(key)
+        return None if value is None else int(value)
+
+    def test_total_seeded_then_counted(self, app, redis, job):
+        """The first check sums today's jobs; new jobs add to the total."""
+        with app.app_context():
+            user_id = db.session.get(EmailJob, job).user_id
+            assert MailService().validate_sending_quota(user_id, 1) == (True, None)
+            assert self.cached_total(redis, user_id) == 5
+
+            add_job(user_id, 3)
+            assert self.cached_total(redis, user_id) == 8
+
+    def test_job_counted_during_seed_not_lost(self, app, redis, job):
+        """A job committed between the sum and the seed is not dropped."""
+        with app.app_context():
+            user_id = db.session.get(EmailJob, job).user_id
+            real_sum = MailService._sum_job_recipients
+
+            def sum_then_race(user_id, since):
+                total = real_sum(user_id, since)
+                add_job(user_id, 3)  # finds no counter to add to
+                return total
+
+            with patch.object(MailService, '_sum_job_recipients',
+                              side_effect=sum_then_race):
+                MailService().validate_sending_quota(user_id, 1)
+
+            # The stale total was not cached, so the next check sums again
+            assert self.cached_total(redis, user_id) is None
+            MailService().validate_sending_quota(user_id, 1)
+            assert self.cached_total(redis, user_id) == 8
@@ -0,0 +1,63 @@
+import fakeredis
+import pytest
+from unittest.mock import patch
+from app.models import User
+from app.services.quota_service import QuotaService
+from app.extensions import db
+
+
+@pytest.fixture
+def redis():
+    """Real Redis semantics for the role cache."""
+    fake = fakeredis.FakeRedis()
+    with patch('app.services.quota_service.redis_client', fake):
+        yield fake
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(
+            name='Member',
+            email='member@example.com',
+            password_hash='test_hash',
+            role='free',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+class TestUserRoleCache:
+    def test_role_change_invalidates_cache(self, app, redis, user):
+        """A committed role change is seen before the cache expires."""
+        with app.app_context():
+            assert QuotaService.get_user_role(user) == 'free'
+            assert redis.exists(QuotaService._get_role_cache_key(user))
+
+            db.session.get(User, user).role = 'pro'
+            db.session.commit()
+
+            assert not redis.exists(QuotaService._get_role_cache_key(user))
+            assert QuotaService.get_user_role(user) == 'pro'
+
+    def test_other_updates_keep_cache(self, app, redis, user):
+        with app.app_context():
+            QuotaService.get_user_role(user)
+            db.session.get(User, user).name = 'Renamed'
+            db.session.commit()
+
+            assert redis.exists(QuotaService._get_role_cache_key(user))
+
+    def test_rolled_back_change_keeps_cache(self, app, redis, user):
+        with app.app_context():
+            QuotaService.get_user_role(user)
+            db.session.get(User, user).role = 'pro'
+            db.session.flush()
+            db.session.rollback()
+            db.session.commit()
+
+            assert redis.exists(QuotaService._get_role_cache_key(user))
+            assert QuotaService.get_user_role(user) == 'free'
@@ -0,0 +1,138 @@
+import fakeredis
+import pytest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+from app.models import User, SMTPConfiguration, UserSMTPHealth
+from app.services.analytics_service import AnalyticsService
+from app.services.smtp_service import SMTPService
+from app.extensions import db
+
+
+@pytest.fixture
+def redis():
+    """Real Redis semantics for the send counters."""
+    fake = fakeredis.FakeRedis()
+    with patch('app.services.smtp_service.redis_client', fake):
+        yield fake
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(
+            name='SMTP Owner',
+            email='smtp@example.com',
+            password_hash='test_hash',
+            role='pro',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def add_config(user_id, **kwargs):
+    config = SMTPConfiguration(
+        user_id=user_id, name='Primary', host='smtp.example.com', port=587,
+        username='u', password='p', **kwargs)
+    db.session.add(config)
+    db.session.commit()
+    return config
+
+
+class TestFlushSendCounters:
+    @pytest.mark.parametrize('row_count,redis_count,expected', [
+        (7, 3, 7),  # slots claimed on the row while Redis was down
+        (2, 5, 5),
+    ])
+    def test_same_day_keeps_higher_count(self, app, redis, user,
+                                         row_count, redis_count, expected):
+        """A flush never drops sends the row counted for the same day."""
+        with app.app_context():
+            now = datetime.now(timezone.utc)
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            config = add_config(user, emails_sent_today=row_count,
+                                last_reset_date=today)
+            redis.set(SMTPService.get_sent_counter_key(config.id, now.date()),
+                      redis_count)
+            redis.hset(SMTPService.USAGE_LAST_USED_KEY, config.id,
+                       now.timestamp())
+
+            assert SMTPService.flush_send_counters() == (1, None)
+            db.session.refresh(config)
+            assert config.emails_sent_today == expected
+
+    def test_new_day_takes_counter(self, app, redis, user):
+        """Yesterday's count on the row is replaced by today's counter."""
+        with app.app_context():
+            now = datetime.now(timezone.utc)
+            yesterday = now.replace(hour=0, minute=0, second=0,
+                                    microsecond=0) - timedelta(days=1)
+            config = add_config(user, emails_sent_today=40,
+                                last_reset_date=yesterday)
+            redis.set(SMTPService.get_sent_counter_key(config.id, now.date()), 2)
+            redis.hset(SMTPService.USAGE_LAST_USED_KEY, config.id,
+                       now.timestamp())
+
+            assert SMTPService.flush_send_counters() == (1, None)
+            db.session.refresh(config)
+            assert config.emails_sent_today == 2
+            assert config.last_reset_date.date() == now.date()
+
+
+def health(user_id):
+    db.session.expire_all()
+    return AnalyticsService.get_smtp_health(user_id)
+
+
+class TestSMTPHealth:
+    def test_rebuild_counts_unset_is_active(self, app, user):
+        """Configs with is_active unset count as active, like the seed."""
+        with app.app_context():
+            legacy = add_config(user)
+            add_config(user, is_active=False)
+            # Rows from before is_active had a default hold NULL
+            table = SMTPConfiguration.__table__
+            db.session.execute(table.update().where(
+                table.c.id == legacy.id).values(is_active=None))
+            db.session.commit()
+            assert db.session.get(UserSMTPHealth, user) is None
+
+            assert health(user) == {'total_active': 1, 'healthy': 1,
+                                    'warning': 0, 'critical': 0}
+
+    def test_buckets_follow_config_changes(self, app, user):
+        """Inserts, updates, deletes and record_failure move the counters."""
+        with app.app_context():
+            health(user)  # start tracking
+            config = add_config(user)
+            assert health(user) == {'total_active': 1, 'healthy': 1,
+                                    'warning': 0, 'critical': 0}
+
+            config.failure_count = 3
+            db.session.commit()
+            assert health(user) == {'total_active': 1, 'healthy': 0,
+                                    'warning': 1, 'critical': 0}
+
+            SMTPConfiguration.record_failure(config.id)
+            db.session.commit()
+            assert health(user) == {'total_active': 1, 'healthy': 0,
+                                    'warning': 0, 'critical': 1}
+
+            config.is_active = False
+            db.session.commit()
+            assert health(user) == {'total_active': 0, 'healthy': 0,
+                                    'warning': 0, 'critical': 0}
+
+            # Inactive configs are not counted when they fail
+            SMTPConfiguration.record_failure(config.id)
+            config.is_active = True
+            db.session.commit()
+            assert health(user) == {'total_active': 1, 'healthy': 0,
+                                    'warning': 0, 'critical': 1}
+
+            db.session.delete(config)
+            db.session.commit()
+            assert health(user) == {'total_active': 0, 'healthy': 0,
+                                    'warning': 0, 'critical': 0}
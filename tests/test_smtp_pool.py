@@ -0,0 +1,69 @@
+import smtplib
+import socket
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.smtp_pool import CachedDNSSMTP
+from app.utils import dns_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_dns_cache():
+    dns_cache._cache.clear()
+    yield
+    dns_cache._cache.clear()
+
+
+def addrinfo(*ips):
+    return [(socket.AF_INET6 if ':' in ip else socket.AF_INET,
+             socket.SOCK_STREAM, 6, '', (ip, 25)) for ip in ips]
+
+
+class TestDNSCache:
+    def test_keeps_every_address(self):
+        with patch('socket.getaddrinfo', return_value=addrinfo(
+                '2001:db8::1', '192.0.2.1', '192.0.2.1')) as lookup:
+            assert dns_cache.resolve('mx.example.com', 25) == (
+                '2001:db8::1', '192.0.2.1')
+            assert dns_cache.resolve('mx.example.com', 25) == (
+                '2001:db8::1', '192.0.2.1')
+        assert lookup.call_count == 1
+
+
+class TestCachedDNSSMTP:
+    def connect(self, reachable):
+        """Connect to mx.example.com where only some addresses answer.
+
+        Returns the addresses tried and the error raised, if any.
+        """
+        tried = []
+
+        def get_socket(self, host, port, timeout):
+            tried.append(host)
+            if host not in reachable:
+                raise OSError('Network is unreachable')
+            return MagicMock()
+
+        with patch('socket.getaddrinfo', return_value=addrinfo(
+                '2001:db8::1', '192.0.2.1', '192.0.2.2')), \
+                patch.object(smtplib.SMTP, '_get_socket', get_socket):
+            try:
+                CachedDNSSMTP()._get_socket('mx.example.com', 25, 5)
+            except OSError as e:
+                return tried, e
+        return tried, None
+
+    def test_falls_back_to_next_address(self):
+        """An unreachable first record doesn't fail the connection."""
+        tried, error = self.connect({'192.0.2.1'})
+
+        assert error is None
+        assert tried == ['2001:db8::1', '192.0.2.1']
+        assert ('mx.example.com', 25) in dns_cache._cache
+
+    def test_invalidates_when_all_fail(self):
+        """The addresses are forgotten only once every one has failed."""
+        tried, error = self.connect(set())
+
+        assert isinstance(error, OSError)
+        assert tried == ['2001:db8::1', '192.0.2.1', '192.0.2.2']
+        assert ('mx.example.com', 25) not in dns_cache._cache
@@ -0,0 +1,66 @@
+import pytest
+from app.models import User, Template
+from app.services.template_service import TemplateService
+from app.extensions import db
+
+STALE_ERROR = "Template was modified by another request, please reload and try again"
+ORIGINAL = '<html><body><p>Hello {{name}}</p></body></html>'
+EDITED = '<html><body><p>Hi {{name}}</p></body></html>'
+
+
+@pytest.fixture
+def template(app):
+    """Create a user with one template at version 1."""
+    with app.app_context():
+        user = User(
+            name='Author',
+            email='author@example.com',
+            password_hash='test_hash',
+            role='pro',
+            email_verified=True,
+            is_active=True
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        template, error = TemplateService.create_template(
+            user.id, 'Welcome', ORIGINAL)
+        assert error is None
+        return template.id, user.id
+
+
+def bump_version_elsewhere(template_id):
+    """Commit a version bump on another connection, like a parallel request."""
+    table = Template.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.update().where(
+            table.c.id == template_id).values(version=table.c.version + 1))
+
+
+class TestTemplateVersionLock:
+    def test_update_bumps_version(self, app, template):
+        template_id, user_id = template
+        with app.app_context():
+            updated, error = TemplateService.update_template(
+                template_id, user_id, EDITED)
+
+            assert error is None
+            assert updated.version == 2
+
+    def test_concurrent_update_rejected(self, app, template):
+        """An update based on a version another request replaced fails cleanly."""
+        template_id, user_id = template
+        with app.app_context():
+            loaded = db.session.get(Template, template_id)
+            bump_version_elsewhere(template_id)
+            assert loaded.version == 1
+
+            updated, error = TemplateService.update_template(
+                template_id, user_id, EDITED)
+
+            assert updated is None and error == STALE_ERROR
+            db.session.expire_all()
+            template = db.session.get(Template, template_id)
+            assert template.version == 2
+            assert template.html_content == ORIGINAL
+            assert template.versions == []